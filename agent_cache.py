@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Only agent runs that did nothing but create tasks are replayed from the cache
+CACHEABLE_TOOLS = {'create_task', 'create_tasks'}
+
+
+# The create_task arguments of the agent's last run (the messages after the
+# last human message), or None unless every tool call of the run created
+# tasks successfully
+def created_task_calls(messages):
+    start = max((index for index, message in enumerate(messages) if message.type == 'human'), default=-1) + 1
+    run = messages[start:]
+    tool_messages = [message for message in run if message.type == 'tool']
+    if not tool_messages or any(message.name not in CACHEABLE_TOOLS or getattr(message, 'status', 'success') != 'success'
+                                for message in tool_messages):
+        return None
+    calls = []
+    for message in run:
+        for call in getattr(message, 'tool_calls', None) or []:
+            if call['name'] == 'create_task':
+                calls.append(dict(call['args']))
+            elif call['name'] == 'create_tasks':
+                calls.extend(dict(task) for task in call['args'].get('tasks', []))
+    return calls or None
+
+
+class ResponseCache:
+    """Agent parses keyed by normalised message, bounded by TTL and LRU.
+
+    Students of one class often post the same assignment within minutes; a
+    repeated post replays the tasks the agent parsed from the first one
+    instead of another agent run. Entries expire after `ttl` seconds and the least
+    recently used ones are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries=256, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evictions': self.evictions,
+            }
+
+
+class DuplicateGuard:
+    """Detects new tasks that repeat an open task, so their insert is skipped.
+
+    A task is a duplicate when an open task with the same due date has a
+    title at least `cutoff` similar (see TaskSnapshot.find_duplicate).
+    """
+
+    def __init__(self, cutoff=0.85):
+        self.cutoff = cutoff
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.skipped = 0
+
+    # The open task in `snapshot` that the new task would repeat, or None
+    def find(self, snapshot, title, due_date):
+        duplicate = snapshot.find_duplicate(title, due_date, cutoff=self.cutoff)
+        with self._lock:
+            self.checked += 1
+            if duplicate is not None:
+                self.skipped += 1
+        if duplicate is not None:
+            print(f"Skipping '{title}': duplicate of open task '{duplicate['title']}' ({duplicate['id']})")
+        return duplicate
+
+    def stats(self):
+        with self._lock:
+            return {'checked': self.checked, 'skipped': self.skipped}
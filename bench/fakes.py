@@ -0,0 +1,357 @@
+import asyncio
+import itertools
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+import discord
+import httplib2
+from googleapiclient.errors import HttpError
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+def _now_rfc3339():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+# The API keeps only the date part of `due` and returns it as midnight UTC
+def _normalize_due(task):
+    if task.get('due'):
+        task['due'] = datetime.fromisoformat(task['due'].replace('Z', '+00:00')).strftime('%Y-%m-%dT00:00:00.000Z')
+
+
+class FakeRequest:
+    """A prepared Google API call; `execute()` costs one HTTP round trip."""
+
+    def __init__(self, service, method, call):
+        self.service = service
+        self.method = method
+        self.call = call
+
+    def execute(self, num_retries=0):
+        self.service.round_trip(self.method)
+        return self.call()
+
+
+class FakeBatch:
+    """BatchHttpRequest stand-in: all added requests share one round trip."""
+
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.service.round_trip('batch')
+        for request_id, request in self.requests:
+            self.service.count(request.method)
+            try:
+                response, exception = request.call(), None
+            except HttpError as e:
+                response, exception = None, e
+            self.callback(request_id, response, exception)
+
+
+class _Resource:
+    def __init__(self, **methods):
+        self.__dict__.update(methods)
+
+
+class FakeTasksService:
+    """In-process Google Tasks v1 service with tasklists, tasks and paging.
+
+    Every `execute()` sleeps `latency` seconds and is counted per method, so
+    benchmarks see realistic round trips without any network access.
+    """
+
+    def __init__(self, latency=0.0, page_size=100):
+        self.latency = latency
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.tasklists_by_id = {}
+        self.calls = Counter()
+
+    def count(self, method):
+        with self._lock:
+            self.calls[method] += 1
+
+    def round_trip(self, method):
+        self.count(method)
+        self.count('http_requests')
+        if self.latency:
+            time.sleep(self.latency)
+
+    def add_tasklist(self, title):
+        tasklist_id = f'list{next(self._ids)}'
+        self.tasklists_by_id[tasklist_id] = {'id': tasklist_id, 'title': title, 'tasks': {}}
+        return tasklist_id
+
+    def add_task(self, tasklist_id, title, due=None, status='needsAction'):
+        return self._insert(tasklist_id, {'title': title, 'due': due, 'status': status})
+
+    # Fill a tasklist with `count` tasks: mostly upcoming, some overdue, undated and completed
+    def populate(self, tasklist_id, count, today=None):
+        today = today or date.today()
+        for index in range(count):
+            kind = index % 10
+            due = None if kind == 9 else f"{today + timedelta(days=(index % 21) - (7 if kind == 8 else -1))}T00:00:00.000Z"
+            self.add_task(tasklist_id, f"Aufgabe {index} Mathe S. {index % 200}", due,
+                          'completed' if kind == 7 else 'needsAction')
+
+    def _page(self, items, page_token, max_results):
+        start = int(page_token or 0)
+        size = min(max_results or self.page_size, self.page_size)
+        result = {'items': items[start:start + size]}
+        if start + size < len(items):
+            result['nextPageToken'] = str(start + size)
+        return result
+
+    def _tasklist(self, tasklist_id):
+        if tasklist_id not in self.tasklists_by_id:
+            raise HttpError(httplib2.Response({'status': 404}), b'Tasklist not found')
+        return self.tasklists_by_id[tasklist_id]
+
+    def _insert(self, tasklist_id, body):
+        with self._lock:
+            task = {key: value for key, value in body.items() if value is not None}
+            task.update(id=f'task{next(self._ids)}', updated=_now_rfc3339())
+            task.setdefault('status', 'needsAction')
+            _normalize_due(task)
+            self._tasklist(tasklist_id)['tasks'][task['id']] = task
+            return dict(task)
+
+    def _patch(self, tasklist_id, task_id, body):
+        with self._lock:
+            tasks = self._tasklist(tasklist_id)['tasks']
+            if task_id not in tasks:
+                raise HttpError(httplib2.Response({'status': 404}), b'Task not found')
+            tasks[task_id].update(body, updated=_now_rfc3339())
+            _normalize_due(tasks[task_id])
+            return dict(tasks[task_id])
+
+    def _list_tasks(self, tasklist, maxResults=None, pageToken=None, updatedMin=None, completedMin=None,
+                    completedMax=None, showCompleted=True, showDeleted=False, showHidden=False, **params):
+        with self._lock:
+            items = []
+            for task in self._tasklist(tasklist)['tasks'].values():
+                if updatedMin and task['updated'] < updatedMin:
+                    continue
+                if task.get('deleted') and not showDeleted:
+                    continue
+                if task.get('hidden') and not showHidden:
+                    continue
+                if task['status'] != 'completed' and (completedMin or completedMax):
+                    continue  # Only completed tasks have a completion date to filter by
+                if task['status'] == 'completed':
+                    if not showCompleted:
+                        continue
+                    if completedMin and task.get('completed', '') < completedMin:
+                        continue
+                    if completedMax and task.get('completed', '') >= completedMax:
+                        continue
+                items.append(dict(task))
+        return self._page(items, pageToken, maxResults)
+
+    def _list_tasklists(self, maxResults=None, pageToken=None):
+        items = [{'id': tasklist['id'], 'title': tasklist['title']} for tasklist in self.tasklists_by_id.values()]
+        return self._page(items, pageToken, maxResults)
+
+    def tasklists(self):
+        return _Resource(list=lambda **kw: FakeRequest(self, 'tasklists.list', lambda: self._list_tasklists(**kw)))
+
+    def tasks(self):
+        return _Resource(
+            list=lambda **kw: FakeRequest(self, 'tasks.list', lambda: self._list_tasks(**kw)),
+            insert=lambda tasklist, body: FakeRequest(self, 'tasks.insert', lambda: self._insert(tasklist, body)),
+            patch=lambda tasklist, task, body: FakeRequest(self, 'tasks.patch', lambda: self._patch(tasklist, task, body)),
+        )
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+
+_snowflakes = itertools.count()
+
+
+# A message ID carrying the current time, like a real Discord snowflake
+def new_snowflake():
+    return discord.utils.time_snowflake(datetime.now(timezone.utc)) + next(_snowflakes) % 4096
+
+
+class FakeUser:
+    def __init__(self, name):
+        self.id = new_snowflake()
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+
+class FakeMessage:
+    def __init__(self, channel, author, content):
+        self.id = new_snowflake()
+        self.channel = channel
+        self.author = author
+        self.content = content
+        self.pinned = False
+
+    async def pin(self):
+        await self.channel.client.round_trip('pin')
+        self.pinned = True
+
+
+class FakePartialMessage:
+    def __init__(self, channel, message_id):
+        self.channel = channel
+        self.id = message_id
+
+    def _message(self):
+        if self.id not in self.channel.messages:
+            raise discord.NotFound(_FakeResponse(404), 'Unknown Message')
+        return self.channel.messages[self.id]
+
+    async def edit(self, content):
+        await self.channel.client.round_trip('edit')
+        self._message().content = content
+
+    async def delete(self):
+        await self.channel.client.round_trip('delete')
+        self._message()
+        del self.channel.messages[self.id]
+
+
+class _FakeResponse:
+    def __init__(self, status):
+        self.status = status
+        self.reason = 'Fake'
+
+
+class FakeChannel:
+    def __init__(self, client, guild, name):
+        self.client = client
+        self.guild = guild
+        self.id = new_snowflake()
+        self.name = name
+        self.messages = {}
+
+    def __str__(self):
+        return self.name
+
+    async def send(self, content, view=None):
+        await self.client.round_trip('send')
+        message = FakeMessage(self, self.client.user, content)
+        self.messages[message.id] = message
+        return message
+
+    # A message from a user, as the gateway would deliver it
+    def receive(self, author, content):
+        message = FakeMessage(self, author, content)
+        self.messages[message.id] = message
+        return message
+
+    def get_partial_message(self, message_id):
+        return FakePartialMessage(self, message_id)
+
+    async def history(self, limit=100):
+        await self.client.round_trip('history')
+        for message in sorted(self.messages.values(), key=lambda message: message.id, reverse=True)[:limit]:
+            yield message
+
+    async def pins(self, limit=50, oldest_first=False):
+        await self.client.round_trip('pins')
+        pinned = sorted((message for message in self.messages.values() if message.pinned),
+                        key=lambda message: message.id, reverse=not oldest_first)
+        for message in pinned[:limit]:
+            yield message
+
+    async def delete_messages(self, messages):
+        await self.client.round_trip('bulk_delete')
+        for message in messages:
+            self.messages.pop(message.id, None)
+
+    async def purge(self, limit=None, check=None, before=None, bulk=True):
+        deleted = [message for message in self.messages.values()
+                   if (check is None or check(message))
+                   and (before is None or discord.utils.snowflake_time(message.id) < before)]
+        for start in range(0, len(deleted), 100):
+            await self.delete_messages(deleted[start:start + 100])
+        return deleted
+
+
+class FakeGuild:
+    def __init__(self, client, name, channel_names):
+        self.name = name
+        self.text_channels = [FakeChannel(client, self, channel_name) for channel_name in channel_names]
+
+
+class FakeDiscordClient:
+    """Just enough of discord.Client for the overview registry and deletions."""
+
+    def __init__(self, channel_names, latency=0.0):
+        self.latency = latency
+        self.user = FakeUser('bot')
+        self.calls = Counter()
+        self.guilds = [FakeGuild(self, 'bench', channel_names)]
+
+    async def round_trip(self, method):
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def get_channel(self, channel_id):
+        for guild in self.guilds:
+            for channel in guild.text_channels:
+                if channel.id == channel_id:
+                    return channel
+        return None
+
+    def channel(self, name):
+        return next(channel for guild in self.guilds for channel in guild.text_channels if channel.name == name)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Tool-calling chat model that answers from a fixed script.
+
+    "erledigt <title>" completes a task, questions list the open tasks, and
+    anything else creates a task due tomorrow. After a tool result the model
+    replies with a short confirmation.
+    """
+
+    latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return 'scripted'
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _tool_call(self, text):
+        if text.lower().startswith('erledigt '):
+            return 'complete_task', {'task_title': text[len('erledigt '):]}
+        if text.rstrip().endswith('?'):
+            return 'get_pending_and_passed_tasks', {'tasklist_title': 'Schule'}
+        return 'create_task', {'task_title': text[:80], 'due_date': (date.today() + timedelta(days=1)).isoformat()}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        self.calls += 1
+        last = messages[-1]
+        if isinstance(last, HumanMessage):
+            name, args = self._tool_call(last.content)
+            message = AIMessage(content='', tool_calls=[{'name': name, 'args': args, 'id': f'call_{uuid.uuid4().hex}'}])
+        elif isinstance(last, ToolMessage):
+            message = AIMessage(content=f"Erledigt: {last.content}")
+        else:
+            message = AIMessage(content="OK")
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,285 @@
+"""Offline benchmark of the bot against in-process fakes.
+
+Drives on_message, update_tasks, display_tasks, the agent tools and a restart with
+fake Google Tasks, Discord and chat model backends and reports p50/p95
+latencies, API call counts and memory use. Run from the repository root:
+
+    python bench/run.py --users 20 --tasks 500 --json bench-results.json
+
+Compare the JSON output of two commits to see the effect of a change.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fakes import FakeDiscordClient, FakeTasksService, FakeUser, ScriptedChatModel  # noqa: E402
+
+# Message mix sent by every simulated user: fast path, agent create, agent complete, agent question
+MESSAGES = [
+    "Mathe S. {n} Nr. 3 bis morgen",
+    "Essay über Kafka Nummer {n} schreiben",
+    "erledigt Aufgabe {n} Mathe S. {n}",
+    "Welche Aufgaben sind noch offen?",
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(latencies):
+    return {
+        'count': len(latencies),
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'max_ms': max(latencies, default=0.0) * 1000,
+    }
+
+
+# Import main with dummy credentials and its state files in a temporary directory
+def import_main(workdir):
+    from cryptography.fernet import Fernet
+    os.environ.setdefault('DISCORD_TOKEN', 'bench')
+    os.environ.setdefault('AZURE_TOKEN', 'bench')
+    os.environ.setdefault('ENCRYPTION_KEY', Fernet.generate_key().decode())
+    os.environ.setdefault('TIMETABLE_FILE', os.path.join(ROOT, 'timetable_data_by_day.json'))
+    os.environ['TASK_STORE'] = os.path.join(workdir, 'tasks.sqlite')
+    started = time.perf_counter()
+    import main
+    return main, time.perf_counter() - started
+
+
+# Point the bot at the fakes
+def install_fakes(main, service, client, model, workdir):
+    from langgraph.prebuilt import create_react_agent
+    from conversation_memory import ConversationMemory
+    main.authenticate_google_tasks = lambda: service
+    main.sync_engine.service_provider = lambda: service
+    main.overview_registry.client = client
+    main.deletion_scheduler.client = client
+    main.deletion_scheduler.state_file = os.path.join(workdir, 'pending_deletions.json')
+    main.conversation_memory = ConversationMemory(db_path=os.path.join(workdir, 'conversations.sqlite'))
+    main.agent_executor = create_react_agent(
+        model, main.tools,
+        checkpointer=main.conversation_memory.checkpointer,
+        prompt=main.conversation_memory.prompt(main.system_prompt),
+    )
+
+
+async def timed(coro):
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started
+
+
+async def bench_display(main, tasklist_id, rounds):
+    cold = await timed(main.run_google(main.display_tasks, tasklist_id))
+    warm = []
+    for _ in range(rounds):
+        main.snapshot_cache.invalidate(tasklist_id)  # Force a delta sync and a new snapshot
+        warm.append(await timed(main.run_google(main.display_tasks, tasklist_id)))
+    cached = [await timed(main.run_google(main.display_tasks, tasklist_id)) for _ in range(rounds)]
+    return {'display_tasks_cold': summarize([cold]), 'display_tasks_resync': summarize(warm),
+            'display_tasks_cached': summarize(cached)}
+
+
+async def bench_update(main, service, client, tasklist_id, rounds):
+    await main.overview_registry.resolve()
+    latencies = []
+    for index in range(rounds):
+        if index % 2:
+            service.add_task(tasklist_id, f"Neue Aufgabe {index}")
+            main.snapshot_cache.invalidate(tasklist_id)
+        latencies.append(await timed(main.overview_registry.refresh_all()))
+
+    # Time from a write through the bot until the pinned overview shows it, with the refresh loop running
+    channel = client.channel(main.CHANNEL_NAME)
+    main.update_tasks.start()
+    write_latencies = []
+    for index in range(rounds):
+        title = f"Sichtbar {index}"
+        started = time.perf_counter()
+        await main.run_google(main.create_task, title, '2030-01-01')
+        while not any(message.pinned and title in message.content for message in channel.messages.values()):
+            await asyncio.sleep(0.01)
+        write_latencies.append(time.perf_counter() - started)
+    main.update_tasks.cancel()
+    return {'overview_refresh_all': summarize(latencies), 'write_to_overview': summarize(write_latencies)}
+
+
+async def bench_messages(main, client, users, messages_per_user):
+    channel = client.channel(main.CHANNEL_NAME)
+    latencies = {'fast': [], 'agent': []}
+
+    async def user_session(user_index):
+        author = FakeUser(f'user{user_index}')
+        for index in range(messages_per_user):
+            text = MESSAGES[index % len(MESSAGES)].format(n=user_index * messages_per_user + index)
+            message = channel.receive(author, text)
+            fast_before = main.fast_path_stats.counts['fast']
+            elapsed = await timed(main.on_message(message))
+            path = 'fast' if main.fast_path_stats.counts['fast'] > fast_before else 'agent'
+            latencies[path].append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user_session(index) for index in range(users)))
+    elapsed = time.perf_counter() - started
+    total = sum(len(values) for values in latencies.values())
+    return {
+        'on_message_fast_path': summarize(latencies['fast']),
+        'on_message_agent': summarize(latencies['agent']),
+        'on_message_throughput_per_s': total / elapsed if elapsed else 0.0,
+    }
+
+
+# The same assignment posted by every user, as the agent and the fast path see it
+async def bench_repeats(main, service, client, model, users):
+    channel = client.channel(main.CHANNEL_NAME)
+    inserts, llm_calls = service.calls['tasks.insert'], model.calls
+    latencies = []
+    for text in ("Referat über die Weimarer Republik vorbereiten", "Englisch Workbook S. 77 bis morgen"):
+        for user_index in range(users):
+            message = channel.receive(FakeUser(f'repeat{user_index}'), text)
+            latencies.append(await timed(main.on_message(message)))
+    return {
+        'on_message_repeated_post': summarize(latencies),
+        'repeated_post_inserts': float(service.calls['tasks.insert'] - inserts),
+        'repeated_post_llm_calls': float(model.calls - llm_calls),
+    }
+
+
+async def bench_tools(main, rounds):
+    calls = {
+        'tool_create_task': lambda n: main.create_task_tool.invoke({'task_title': f"Tool Aufgabe {n}", 'due_date': '2030-01-01'}),
+        'tool_create_tasks': lambda n: main.create_tasks_tool.invoke({'tasks': [
+            {'task_title': f"Batch {n}.{i}", 'due_date': '2030-01-01'} for i in range(5)]}),
+        'tool_get_pending_and_passed_tasks': lambda n: main.get_pending_tasks_tool.invoke({'tasklist_title': 'Schule'}),
+        'tool_complete_task': lambda n: main.complete_task_tool.invoke({'task_title': f"Tool Aufgabe {n}"}),
+        'tool_complete_tasks': lambda n: main.complete_tasks_tool.invoke({'task_titles': [f"Batch {n}.{i}" for i in range(5)]}),
+    }
+    results = {}
+    for name, call in calls.items():
+        latencies = []
+        for n in range(rounds):
+            started = time.perf_counter()
+            await main.blocking_executor.run('google', call, n)
+            latencies.append(time.perf_counter() - started)
+        results[name] = summarize(latencies)
+    return results
+
+
+# Time until the overview is rendered again after a restart, served from the local store
+async def bench_restart(main, service, tasklist_id, rounds):
+    from task_sync import TaskSyncEngine
+    latencies = []
+    google_calls = service.calls['http_requests']
+    for _ in range(rounds):
+        main.sync_engine = TaskSyncEngine(full_resync_interval=900, store=main.task_store,
+                                          service_provider=lambda: service)
+        main.snapshot_cache.invalidate(tasklist_id)
+        started = time.perf_counter()
+        await main.blocking_executor.run('google', main.load_local_tasks)
+        await main.render_overview(tasklist_id)
+        latencies.append(time.perf_counter() - started)
+    return {'restart_to_overview': summarize(latencies),
+            'restart_google_requests': float(service.calls['http_requests'] - google_calls)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args):
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory() as workdir:
+        main, import_seconds = import_main(workdir)
+
+        service = FakeTasksService(latency=args.google_latency, page_size=args.page_size)
+        school_id = service.add_tasklist("Schule")
+        service.populate(school_id, args.tasks)
+        private_id = service.add_tasklist("My Tasks")
+        service.populate(private_id, args.tasks // 10)
+        client = FakeDiscordClient([main.CHANNEL_NAME, 'private-tasks'], latency=args.discord_latency)
+        model = ScriptedChatModel(latency=args.llm_latency)
+        install_fakes(main, service, client, model, workdir)
+
+        results = {'import_main_s': import_seconds}
+        results.update(await bench_display(main, school_id, args.rounds))
+        results.update(await bench_update(main, service, client, school_id, args.rounds))
+        results.update(await bench_messages(main, client, args.users, args.messages))
+        results.update(await bench_repeats(main, service, client, model, args.users))
+        results.update(await bench_tools(main, args.rounds))
+        results.update(await bench_restart(main, service, school_id, args.rounds))
+        main.blocking_executor.shutdown()
+
+        _, peak = tracemalloc.get_traced_memory()
+        return {
+            'commit': git_commit(),
+            'parameters': vars(args),
+            'results': results,
+            'google_calls': dict(service.calls),
+            'discord_calls': dict(client.calls),
+            'llm_calls': model.calls,
+            'discord_throttled_s': main.discord_governor.stats()['throttled_seconds'],
+            'memory': {
+                'tracemalloc_peak_mb': peak / 2 ** 20,
+                'rss_mb': psutil.Process().memory_info().rss / 2 ** 20,
+            },
+        }
+
+
+def print_report(report):
+    print(f"\nBenchmark results (commit {report['commit']})")
+    for name, value in report['results'].items():
+        if isinstance(value, dict):
+            print(f"  {name:36} n={value['count']:<5} p50={value['p50_ms']:8.1f} ms  "
+                  f"p95={value['p95_ms']:8.1f} ms  max={value['max_ms']:8.1f} ms")
+        else:
+            print(f"  {name:36} {value:.2f}")
+    print("  Google calls:  " + ", ".join(f"{key}={value}" for key, value in sorted(report['google_calls'].items())))
+    print("  Discord calls: " + ", ".join(f"{key}={value}" for key, value in sorted(report['discord_calls'].items())))
+    print(f"  LLM calls: {report['llm_calls']}")
+    print(f"  Discord route pacing: {report['discord_throttled_s']:.1f} s spent waiting for rate limit tokens")
+    print(f"  Memory: peak traced {report['memory']['tracemalloc_peak_mb']:.1f} MB, RSS {report['memory']['rss_mb']:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--users', type=int, default=10, help="concurrent users sending messages")
+    parser.add_argument('--messages', type=int, default=4, help="messages per user")
+    parser.add_argument('--tasks', type=int, default=300, help="tasks in the school tasklist")
+    parser.add_argument('--rounds', type=int, default=10, help="repetitions per single-call benchmark")
+    parser.add_argument('--page-size', type=int, default=100, help="tasks per list page")
+    parser.add_argument('--google-latency', type=float, default=0.02, help="seconds per Google round trip")
+    parser.add_argument('--discord-latency', type=float, default=0.01, help="seconds per Discord round trip")
+    parser.add_argument('--llm-latency', type=float, default=0.2, help="seconds per chat model call")
+    parser.add_argument('--json', help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BlockingCallExecutor:
+    """Runs blocking LLM and Google API calls off the Discord event loop.
+
+    Each kind of call gets its own bounded thread pool, so a burst of slow
+    LLM requests cannot starve the overview refresh of Google workers.
+    """
+
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self._pools = {
+            kind: ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'{kind}-worker')
+            for kind, max_workers in self.limits.items()
+        }
+        self._lock = threading.Lock()
+        self._submitted = {kind: 0 for kind in self.limits}
+        self._running = {kind: 0 for kind in self.limits}
+        self._completed = {kind: 0 for kind in self.limits}
+        self._busy_seconds = {kind: 0.0 for kind in self.limits}
+
+    def _call(self, kind, func):
+        with self._lock:
+            self._running[kind] += 1
+        start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            with self._lock:
+                self._running[kind] -= 1
+                self._completed[kind] += 1
+                self._busy_seconds[kind] += time.perf_counter() - start
+
+    # Run func(*args, **kwargs) on the pool for `kind` and await its result
+    async def run(self, kind, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._submitted[kind] += 1
+        call = functools.partial(self._call, kind, functools.partial(func, *args, **kwargs))
+        try:
+            return await loop.run_in_executor(self._pools[kind], call)
+        finally:
+            with self._lock:
+                self._submitted[kind] -= 1
+
+    # Calls waiting for a free worker
+    def queue_depth(self, kind):
+        with self._lock:
+            return max(0, self._submitted[kind] - self._running[kind])
+
+    def shutdown(self):
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                kind: {
+                    'limit': self.limits[kind],
+                    'running': self._running[kind],
+                    'queued': max(0, self._submitted[kind] - self._running[kind]),
+                    'completed': self._completed[kind],
+                    'busy_seconds': self._busy_seconds[kind],
+                }
+                for kind in self.limits
+            }
@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.messages import HumanMessage, RemoveMessage, SystemMessage
+
+
+class ConversationMemory:
+    """Bounded, persistent agent conversations, one thread per channel and user.
+
+    Checkpoints are stored in a local SQLite database so conversations
+    survive restarts. Each thread keeps at most `max_messages` messages (older
+    turns are removed from the state and only the newest checkpoint is kept),
+    and threads idle for `idle_timeout` seconds or beyond the `max_threads`
+    most recently used ones are deleted.
+    """
+
+    def __init__(self, db_path='conversations.sqlite', max_messages=20, max_threads=200, idle_timeout=6 * 3600):
+        self.max_messages = max_messages
+        self.max_threads = max_threads
+        self.idle_timeout = idle_timeout
+        from langgraph.checkpoint.sqlite import SqliteSaver
+        self.checkpointer = SqliteSaver(sqlite3.connect(db_path, check_same_thread=False))
+        self.checkpointer.setup()
+        self._lock = threading.Lock()
+        self._last_used = OrderedDict(self._load_threads())
+        self.trimmed_messages = 0
+        self.evicted_threads = 0
+
+    # Known threads, oldest first, so LRU eviction also covers threads from before a restart
+    def _load_threads(self):
+        with self.checkpointer.cursor(transaction=False) as cur:
+            cur.execute("SELECT DISTINCT thread_id FROM checkpoints")
+            return [(row[0], time.time()) for row in cur.fetchall()]
+
+    @staticmethod
+    def thread_id_for(message):
+        return f"{message.channel.id}:{message.author.id}"
+
+    @staticmethod
+    def config(thread_id):
+        return {"configurable": {"thread_id": thread_id}}
+
+    # Prompt hook for the agent: system prompt plus the newest messages only
+    def prompt(self, system_prompt):
+        def build_prompt(state):
+            return [SystemMessage(content=system_prompt)] + self._window(state['messages'])
+        return build_prompt
+
+    # Newest messages, starting at a human turn so no tool call loses its request
+    def _window(self, messages):
+        if len(messages) <= self.max_messages:
+            return list(messages)
+        window = messages[-self.max_messages:]
+        for index, message in enumerate(window):
+            if isinstance(message, HumanMessage):
+                return window[index:]
+        return window[-1:]
+
+    # Mark a thread as used and evict idle or least recently used threads
+    def touch(self, thread_id):
+        now = time.time()
+        with self._lock:
+            self._last_used[thread_id] = now
+            self._last_used.move_to_end(thread_id)
+            evicted = []
+            while self._last_used:
+                oldest_id, last_used = next(iter(self._last_used.items()))
+                if len(self._last_used) <= self.max_threads and now - last_used <= self.idle_timeout:
+                    break
+                del self._last_used[oldest_id]
+                evicted.append(oldest_id)
+        for oldest_id in evicted:
+            self._delete_thread(oldest_id)
+
+    def _delete_thread(self, thread_id):
+        with self.checkpointer.cursor() as cur:
+            cur.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            cur.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+        self.evicted_threads += 1
+        print(f"Evicted conversation thread {thread_id}")
+
+    # Drop messages outside the window from the thread state and keep only its newest checkpoint
+    def trim(self, agent, thread_id):
+        config = self.config(thread_id)
+        messages = agent.get_state(config).values.get('messages', [])
+        keep = self._window(messages)
+        if len(keep) < len(messages):
+            removed = messages[:len(messages) - len(keep)]
+            agent.update_state(config, {"messages": [RemoveMessage(id=message.id) for message in removed]})
+            self.trimmed_messages += len(removed)
+        with self.checkpointer.cursor() as cur:
+            cur.execute(
+                "SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ''",
+                (thread_id,),
+            )
+            latest = cur.fetchone()[0]
+            if latest is not None:
+                cur.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id <> ?", (thread_id, latest))
+                cur.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_id <> ?", (thread_id, latest))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'threads': len(self._last_used),
+                'trimmed_messages': self.trimmed_messages,
+                'evicted_threads': self.evicted_threads,
+            }
@@ -0,0 +1,158 @@
+import asyncio
+import heapq
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import discord
+
+from governor import DiscordGovernor
+
+# Discord only bulk-deletes messages younger than 14 days, at most 100 per call
+BULK_DELETE_MAX_AGE = timedelta(days=14)
+BULK_DELETE_MAX_MESSAGES = 100
+
+
+# Check whether a message ID is still young enough for a bulk delete
+def bulk_deletable(message_id, now=None):
+    now = now or datetime.now(timezone.utc)
+    # Keep a minute of margin so the message does not age out mid-request
+    return now - discord.utils.snowflake_time(message_id) < BULK_DELETE_MAX_AGE - timedelta(minutes=1)
+
+
+# Delete every message in a channel older than `before` that passes `check`,
+# using bulk deletes for messages younger than 14 days and single deletes
+# only for older ones
+async def purge_channel(channel, check, before=None):
+    print(f"Purging messages in {channel.name}")
+    start = time.perf_counter()
+    try:
+        deleted = await channel.purge(limit=None, check=check, before=before, bulk=True)
+    except discord.Forbidden:
+        print(f"Permission error: Cannot delete messages in {channel.name}")
+        return 0
+    except discord.HTTPException as e:
+        print(f"HTTP error: {e} while deleting messages in {channel.name}")
+        return 0
+    elapsed = time.perf_counter() - start
+    print(f"Purged {len(deleted)} messages from {channel.name} in {elapsed:.1f}s "
+          f"({len(deleted) / elapsed if elapsed else 0:.1f} messages/s)")
+    return len(deleted)
+
+
+class DeletionScheduler:
+    """Deletes transient bot and user messages after a delay.
+
+    Pending deletions live in a single time-ordered heap served by one
+    background task. Deletions that fall due together are grouped per channel
+    into bulk deletes, and the heap is written to `state_file` so deletions
+    scheduled before a restart still happen afterwards. Delete calls are
+    paced per channel by the `governor`.
+    """
+
+    def __init__(self, client, state_file='pending_deletions.json', batch_window=2.0, governor=None):
+        self.client = client
+        self.governor = governor or DiscordGovernor()
+        self.state_file = state_file
+        self.batch_window = batch_window
+        self._heap = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.scheduled = 0
+        self.deleted = 0
+        self.bulk_calls = 0
+        self.single_calls = 0
+
+    def _load(self):
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file) as state:
+                self._heap = [tuple(entry) for entry in json.load(state)]
+            heapq.heapify(self._heap)
+            print(f"Loaded {len(self._heap)} pending deletions")
+        except (OSError, ValueError) as e:
+            print(f"Could not load pending deletions: {e}")
+
+    def _save(self):
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, 'w') as state:
+            json.dump(self._heap, state)
+        os.replace(tmp_file, self.state_file)
+
+    # Queue a message for deletion after `delay` seconds and return immediately
+    def schedule(self, message, delay):
+        heapq.heappush(self._heap, (time.time() + delay, message.channel.id, message.id))
+        self.scheduled += 1
+        self._save()
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._load()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Take everything due now or within the batch window, grouped per channel
+            cutoff = time.time() + self.batch_window
+            due = {}
+            while self._heap and self._heap[0][0] <= cutoff:
+                _, channel_id, message_id = heapq.heappop(self._heap)
+                due.setdefault(channel_id, []).append(message_id)
+            for channel_id, message_ids in due.items():
+                await self._delete(channel_id, message_ids)
+            self._save()
+
+    async def _delete(self, channel_id, message_ids):
+        channel = self.client.get_channel(channel_id)
+        if channel is None:
+            print(f"Channel {channel_id} not found, dropping {len(message_ids)} pending deletions")
+            return
+        now = datetime.now(timezone.utc)
+        bulk_ids = [message_id for message_id in message_ids if bulk_deletable(message_id, now)]
+        single_ids = [message_id for message_id in message_ids if message_id not in bulk_ids]
+
+        for start in range(0, len(bulk_ids), BULK_DELETE_MAX_MESSAGES):
+            chunk = bulk_ids[start:start + BULK_DELETE_MAX_MESSAGES]
+            try:
+                await self.governor.call(
+                    ('delete', channel_id), channel.delete_messages, [discord.Object(id=message_id) for message_id in chunk]
+                )
+                self.bulk_calls += 1
+                self.deleted += len(chunk)
+            except discord.HTTPException as e:
+                print(f"Bulk delete failed in {channel}: {e}, deleting one by one")
+                single_ids.extend(chunk)
+
+        for message_id in single_ids:
+            try:
+                await self.governor.call(('delete', channel_id), channel.get_partial_message(message_id).delete)
+                self.single_calls += 1
+                self.deleted += 1
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as e:
+                print(f"HTTP error: {e} while deleting message {message_id} in {channel}")
+
+    def stats(self):
+        return {
+            'pending': len(self._heap),
+            'scheduled': self.scheduled,
+            'deleted': self.deleted,
+            'bulk_calls': self.bulk_calls,
+            'single_calls': self.single_calls,
+        }
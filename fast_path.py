@@ -0,0 +1,224 @@
+import re
+import threading
+import time
+from datetime import date, timedelta
+
+# Subject aliases (lowercase) -> subject name used in task titles
+SUBJECTS = {
+    'mathe': 'Mathe', 'mathematik': 'Mathe', 'math': 'Mathe', 'maths': 'Mathe', 'm': 'Mathe',
+    'deutsch': 'Deutsch', 'german': 'Deutsch', 'd': 'Deutsch',
+    'englisch': 'Englisch', 'english': 'Englisch', 'engl': 'Englisch', 'e': 'Englisch',
+    'bio': 'Bio', 'biologie': 'Bio', 'biology': 'Bio',
+    'chemie': 'Chemie', 'chem': 'Chemie', 'chemistry': 'Chemie',
+    'physik': 'Physik', 'physics': 'Physik', 'phy': 'Physik',
+    'geschichte': 'Geschichte', 'history': 'Geschichte', 'g': 'Geschichte',
+    'erdkunde': 'Erdkunde', 'geo': 'Erdkunde', 'geography': 'Erdkunde',
+    'powi': 'PoWi', 'politik': 'PoWi', 'politics': 'PoWi',
+    'ethik': 'Ethik', 'ethics': 'Ethik', 'eth': 'Ethik',
+    'religion': 'Religion', 'reli': 'Religion',
+    'informatik': 'Informatik', 'info': 'Informatik', 'cs': 'Informatik',
+    'elektrotechnik': 'Elektrotechnik', 'elt': 'Elektrotechnik', 'et': 'Elektrotechnik',
+    'latein': 'Latein', 'latin': 'Latein',
+    'französisch': 'Französisch', 'franz': 'Französisch', 'french': 'Französisch',
+    'spanisch': 'Spanisch', 'spanish': 'Spanisch',
+    'kunst': 'Kunst', 'art': 'Kunst',
+    'musik': 'Musik', 'music': 'Musik',
+    'sport': 'Sport',
+}
+
+WEEKDAYS = {
+    'montag': 0, 'dienstag': 1, 'mittwoch': 2, 'donnerstag': 3, 'freitag': 4, 'samstag': 5, 'sonntag': 6,
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6,
+}
+
+RELATIVE_DAYS = {
+    'heute': 0, 'today': 0,
+    'morgen': 1, 'tomorrow': 1,
+    'übermorgen': 2, 'uebermorgen': 2, 'day after tomorrow': 2,
+}
+
+ENGLISH_WORDS = {'today', 'tomorrow', 'next', 'due', 'by', 'until', 'week', 'days', 'page', 'homework'}
+
+# Words that introduce a due date and are dropped from the title
+DATE_PREPOSITIONS = r'(?:bis(?:\s+(?:zum|zur|am))?|zum|zur|für|fuer|am|auf|due(?:\s+on)?|by|until|on|for)'
+
+_weekday_names = '|'.join(sorted(WEEKDAYS, key=len, reverse=True))
+_relative_names = '|'.join(sorted((re.escape(name) for name in RELATIVE_DAYS), key=len, reverse=True))
+
+DATE_PATTERNS = [
+    ('iso', r'(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})'),
+    ('dotted', r'(?P<day>\d{1,2})\.(?P<month>\d{1,2})\.(?P<year>\d{2,4})?'),
+    ('in_days', r'in\s+(?P<count>\d+|einer|einem|zwei|drei|a|one|two|three)\s+(?P<unit>tagen|tag|days?|wochen|woche|weeks?)'),
+    ('next_week', r'(?:nächste|naechste|next)\s+(?:woche|week)'),
+    ('next_lesson', r'(?:the\s+)?(?:nächsten|naechsten|nächste|next)\s+(?:stunde|unterrichtsstunde|lesson|class)'),
+    ('weekday', r'(?P<after_next>übernächsten|uebernaechsten|übernächste)?\s*(?P<next>nächsten|naechsten|nächste|next|kommenden|this)?\s*(?P<weekday>' + _weekday_names + r')'),
+    ('relative', r'(?P<relative>' + _relative_names + r')'),
+]
+DATE_REGEX = re.compile(
+    r'(?:(?<=\s)|^)(?:' + DATE_PREPOSITIONS + r'\s+)?(?:' + '|'.join(f'(?P<{name}>{pattern.replace("(?P<", f"(?P<{name}_")})' for name, pattern in DATE_PATTERNS) + r')(?=[\s,.!;:]|$)',
+    re.IGNORECASE,
+)
+
+# "in N Tagen" beyond this many days (or weeks) is not a due date
+MAX_IN_DAYS = 366
+
+NUMBER_WORDS = {'einer': 1, 'einem': 1, 'a': 1, 'one': 1, 'zwei': 2, 'two': 2, 'drei': 3, 'three': 3}
+
+# Messages that ask for something other than creating a task go to the agent
+AGENT_ONLY = re.compile(
+    r'\?|\b(erledigt|fertig|gemacht|lösch\w*|loesch\w*|entfern\w*|zeig\w*|welche|was|liste|list|show|done|'
+    r'finished|complete\w*|delete|remove|which|what|how|wie|warum|why|'
+    # Cancellations and negations are news about homework, not homework
+    r'keine?|fällt|faellt|entfällt|entfaellt|ausgefallen|fallen\s+aus|verschoben|abgesagt|'
+    r'no\s+homework|cancel+ed|postponed)\b',
+    re.IGNORECASE,
+)
+
+# First person, asking around and negation mark chatter about homework, not homework
+CHATTER = re.compile(
+    r'\b(ich|hab|habe|hatte|mein\w*|mir|mich|wir|uns|jemand|wer|vergessen|nicht|nie|lol|haha|xd|'
+    r'i|my|me|we|anyone|someone|forgot|not|never)\b',
+    re.IGNORECASE,
+)
+
+# A day and month without a year that lies up to this many days back is a
+# typo or an old date, not next year's (e.g. 20.09. posted before the summer break)
+PAST_DATE_GRACE_DAYS = 120
+
+CONFIDENCE_THRESHOLD = 0.8
+
+
+class ParsedHomework:
+    def __init__(self, title, due_date, subject, confidence, language):
+        self.title = title
+        self.due_date = due_date
+        self.subject = subject
+        self.confidence = confidence
+        self.language = language
+
+    @property
+    def confident(self):
+        return self.confidence >= CONFIDENCE_THRESHOLD
+
+
+# Resolve one matched date expression relative to `today`
+def _resolve_date(match, today, subject, next_lesson):
+    groups = match.groupdict()
+    if groups['next_lesson']:
+        return next_lesson(subject, today) if next_lesson and subject else None
+    if groups['iso']:
+        return date(int(groups['iso_year']), int(groups['iso_month']), int(groups['iso_day']))
+    if groups['dotted']:
+        day, month = int(groups['dotted_day']), int(groups['dotted_month'])
+        year = groups['dotted_year']
+        if year:
+            year = int(year) + 2000 if len(year) == 2 else int(year)
+            return date(year, month, day)
+        # Without a year, a date well in the past means next year (e.g. after
+        # the summer break); one only a few months back is left to the agent
+        candidate = date(today.year, month, day)
+        if candidate >= today:
+            return candidate
+        if (today - candidate).days <= PAST_DATE_GRACE_DAYS:
+            return None
+        return date(today.year + 1, month, day)
+    if groups['in_days']:
+        count = groups['in_days_count'].lower()
+        count = NUMBER_WORDS.get(count) or int(count)
+        if count > MAX_IN_DAYS:
+            raise ValueError(f"{count} days is too far ahead")
+        unit = groups['in_days_unit'].lower()
+        return today + timedelta(days=count * 7 if unit.startswith(('woche', 'week')) else count)
+    if groups['next_week']:
+        return today + timedelta(days=7)
+    if groups['weekday']:
+        weekday = WEEKDAYS[groups['weekday_weekday'].lower()]
+        days_ahead = (weekday - today.weekday()) % 7 or 7
+        if groups['weekday_after_next']:
+            days_ahead += 7
+        return today + timedelta(days=days_ahead)
+    return today + timedelta(days=RELATIVE_DAYS[groups['relative_relative'].lower()])
+
+
+# Normalise a message for caching: lowercase, single spaces and every date
+# expression replaced by the date it means, so "bis morgen" posted today and
+# "bis 18.10." give the same key
+def normalize_message(text, today=None):
+    today = today or date.today()
+    text = ' '.join(text.lower().split())
+
+    def replace(match):
+        try:
+            resolved = _resolve_date(match, today, None, None)
+        except (ValueError, OverflowError):
+            resolved = None
+        return resolved.isoformat() if resolved else match.group(0)
+
+    return DATE_REGEX.sub(replace, text).strip(' ,.;:!')
+
+
+# Parse a homework message like "Mathe S. 42 bis morgen" without the LLM.
+# `next_lesson(subject, today)` resolves "bis zur nächsten Stunde" to a date.
+def parse_homework(text, today=None, next_lesson=None):
+    today = today or date.today()
+    text = ' '.join(text.split())
+    if not text or '\n' in text or AGENT_ONLY.search(text) or CHATTER.search(text):
+        return ParsedHomework(text, None, None, 0.0, 'de')
+
+    words = re.findall(r'[\wäöüß]+', text.lower())
+    subjects = {SUBJECTS[word] for word in words[:3] if word in SUBJECTS and (len(word) > 2 or word == words[0])}
+    subject = subjects.pop() if len(subjects) == 1 else None
+
+    matches = list(DATE_REGEX.finditer(text))
+    due_date = None
+    if len(matches) == 1:
+        try:
+            due_date = _resolve_date(matches[0], today, subject, next_lesson)
+        except (ValueError, OverflowError):
+            due_date = None
+
+    title = text[:matches[0].start()] + text[matches[0].end():] if len(matches) == 1 else text
+    title = ' '.join(title.split())  # Cutting out a date mid-sentence leaves two spaces
+    title = re.sub(r'\s+' + DATE_PREPOSITIONS + r'\s*$', '', title.strip(' ,.;:!'), flags=re.IGNORECASE).strip(' ,.;:!-')
+    if subject and title.lower().split(' ', 1)[0] in SUBJECTS:
+        rest = title.split(' ', 1)[1] if ' ' in title else ''
+        title = f"{subject} {rest}".strip()
+
+    english = any(word in ENGLISH_WORDS for word in words)
+
+    # A subject and a date alone are not enough: the title must say more than the subject
+    confidence = 0.0
+    if due_date is not None and due_date >= today:
+        confidence += 0.4
+    if subject:
+        confidence += 0.3
+    if title and title != subject and len(title) <= 80:
+        confidence += 0.3
+    return ParsedHomework(title, due_date, subject, round(confidence, 2), 'en' if english else 'de')
+
+
+class FastPathStats:
+    """Counts messages handled by the fast path versus the agent, with latency."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {'fast': 0, 'agent': 0}
+        self.seconds = {'fast': 0.0, 'agent': 0.0}
+
+    def record(self, path, started_at):
+        elapsed = time.perf_counter() - started_at
+        with self._lock:
+            self.counts[path] += 1
+            self.seconds[path] += elapsed
+        return elapsed
+
+    def stats(self):
+        with self._lock:
+            total = sum(self.counts.values())
+            return {
+                'fast_path_hits': self.counts['fast'],
+                'agent_fallbacks': self.counts['agent'],
+                'hit_rate': self.counts['fast'] / total if total else 0.0,
+                'fast_avg_ms': self.seconds['fast'] / self.counts['fast'] * 1000 if self.counts['fast'] else 0.0,
+                'agent_avg_ms': self.seconds['agent'] / self.counts['agent'] * 1000 if self.counts['agent'] else 0.0,
+            }
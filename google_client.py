@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+
+import httplib2
+import google_auth_httplib2
+from cryptography.fernet import Fernet
+from google.oauth2 import service_account
+from google.auth.transport.requests import Request
+from googleapiclient.discovery import build, build_from_document
+
+from governor import GovernedHttp
+
+# Scopes allow us to read and write tasks
+SCOPES = ['https://www.googleapis.com/auth/tasks']
+
+
+class GoogleTasksClientProvider:
+    """Process-wide provider for the Google Tasks v1 client.
+
+    The service account file is decrypted once in memory, the credentials are
+    kept and refreshed when they expire, and each thread reuses its own built
+    `tasks` resource (httplib2 connections are not thread-safe). With a
+    `governor`, every request is rate limited and retried through it.
+    """
+
+    def __init__(self, encrypted_file, encryption_key, scopes=SCOPES, http_timeout=30, governor=None):
+        self.encrypted_file = encrypted_file
+        self.encryption_key = encryption_key
+        self.scopes = scopes
+        self.http_timeout = http_timeout
+        self.governor = governor
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._credentials = None
+        self._discovery_doc = None
+        self.cold_acquisitions = 0
+        self.warm_acquisitions = 0
+        self.cold_seconds = 0.0
+        self.warm_seconds = 0.0
+        self.credential_refreshes = 0
+
+    # Decrypt the service account file in memory and load the credentials
+    def _load_credentials(self):
+        with open(self.encrypted_file, "rb") as encrypted_file:
+            encrypted_data = encrypted_file.read()
+        info = json.loads(Fernet(self.encryption_key).decrypt(encrypted_data))
+        print("Service account credentials decrypted in memory.")
+        return service_account.Credentials.from_service_account_info(info, scopes=self.scopes)
+
+    # Refresh the shared credentials if they are missing or expired
+    def _ensure_credentials(self):
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = self._load_credentials()
+            if not self._credentials.valid:
+                self._credentials.refresh(Request())
+                self.credential_refreshes += 1
+            return self._credentials
+
+    # Build a tasks resource bound to its own HTTP connection pool
+    def _build_service(self, credentials):
+        http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=self.http_timeout))
+        if self.governor is not None:
+            http = GovernedHttp(http, self.governor)
+        with self._lock:
+            discovery_doc = self._discovery_doc
+        if discovery_doc is None:
+            # The discovery document bundled with googleapiclient, no HTTP fetch
+            service = build('tasks', 'v1', http=http, cache_discovery=False, static_discovery=True)
+            with self._lock:
+                self._discovery_doc = service._rootDesc
+            return service
+        return build_from_document(discovery_doc, http=http)
+
+    # Return the Google Tasks service for the calling thread
+    def get_service(self):
+        start = time.perf_counter()
+        credentials = self._ensure_credentials()
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._build_service(credentials)
+            self._local.service = service
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.cold_acquisitions += 1
+                self.cold_seconds += elapsed
+            print(f"Built Google Tasks client in {elapsed * 1000:.1f} ms (cold)")
+            return service
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.warm_acquisitions += 1
+            self.warm_seconds += elapsed
+        return service
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cold_acquisitions': self.cold_acquisitions,
+                'warm_acquisitions': self.warm_acquisitions,
+                'cold_avg_ms': self.cold_seconds / self.cold_acquisitions * 1000 if self.cold_acquisitions else 0.0,
+                'warm_avg_ms': self.warm_seconds / self.warm_acquisitions * 1000 if self.warm_acquisitions else 0.0,
+                'credential_refreshes': self.credential_refreshes,
+            }
@@ -0,0 +1,265 @@
+import asyncio
+import random
+import socket
+import threading
+import time
+
+import discord
+import httplib2
+
+# HTTP statuses worth retrying: rate limited or a transient server error
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Methods Google may have carried out before a timeout or 5xx; retrying
+# them could create the same task twice
+NON_IDEMPOTENT_METHODS = {'POST'}
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an API whose circuit breaker is open."""
+
+
+# Exponential backoff with full jitter
+def backoff_delay(attempt, base_delay, max_delay):
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average with bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Take a token, returning how long the caller has to wait for it
+    def _reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures, then lets a
+    single trial call through every `reset_timeout` seconds."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+        self.times_opened = 0
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Half-open: let this call try, keep the rest out until it reports back
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    self.times_opened += 1
+                    print(f"Circuit breaker opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+
+
+class CallMetrics:
+    """Call, retry and failure counters plus a latency histogram."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+        self.throttled_seconds = 0.0
+        self.latency_counts = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+
+    def observe(self, seconds):
+        with self._lock:
+            self.calls += 1
+            self.latency_sum += seconds
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self.latency_counts[index] += 1
+                    break
+
+    def add(self, name, value=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'retries': self.retries,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'throttled_seconds': self.throttled_seconds,
+                'latency_sum': self.latency_sum,
+                'latency_buckets': dict(zip(LATENCY_BUCKETS, self.latency_counts)),
+            }
+
+
+class RequestGovernor:
+    """Rate limit, retry and circuit breaker for the Google Tasks API.
+
+    Installed below googleapiclient through GovernedHttp, so every request,
+    including batch requests, takes a token from the bucket and is retried
+    with exponential backoff and jitter on 429/5xx responses and network
+    errors. Non-idempotent requests (inserts and batches) are only retried
+    when they were rejected by the rate limit, never after a network error
+    or 5xx.
+    """
+
+    def __init__(self, rate=5, capacity=10, max_retries=5, base_delay=0.5, max_delay=30,
+                 failure_threshold=5, reset_timeout=30):
+        self.bucket = TokenBucket(rate, capacity)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = CallMetrics()
+
+    # Run one HTTP exchange `send()` -> (response, content) under the governor
+    def send(self, send, idempotent=True):
+        if not self.breaker.allow():
+            self.metrics.add('rejected')
+            raise CircuitOpenError("Google Tasks API circuit breaker is open")
+        attempt = 0
+        while True:
+            self.metrics.add('throttled_seconds', self.bucket.acquire())
+            start = time.perf_counter()
+            try:
+                response, content = send()
+                error = None
+            except (socket.timeout, TimeoutError, ConnectionError, httplib2.HttpLib2Error) as e:
+                response, content, error = None, None, e
+            self.metrics.observe(time.perf_counter() - start)
+
+            rate_limited = response is not None and (response.status == 429 or (
+                response.status == 403 and b'rateLimitExceeded' in (content or b'')
+            ))
+            failed = error is not None or response.status in RETRYABLE_STATUSES
+            if not failed and not rate_limited:
+                self.breaker.record_success()
+                return response, content
+            if attempt >= self.max_retries or not (idempotent or rate_limited):
+                self.metrics.add('failures')
+                self.breaker.record_failure()
+                if error is not None:
+                    raise error
+                return response, content
+
+            delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+            retry_after = response.get('retry-after') if response is not None else None
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            print(f"Google API call failed ({error or response.status}), retrying in {delay:.1f}s")
+            self.metrics.add('retries')
+            attempt += 1
+            time.sleep(delay)
+
+    def stats(self):
+        return dict(self.metrics.stats(), circuit_open=self.breaker.is_open, circuit_opened=self.breaker.times_opened)
+
+
+class GovernedHttp:
+    """httplib2-compatible wrapper that sends every request through a RequestGovernor."""
+
+    def __init__(self, http, governor):
+        self.http = http
+        self.governor = governor
+
+    def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+        return self.governor.send(lambda: self.http.request(uri, method, body, headers, *args, **kwargs),
+                                  idempotent=method.upper() not in NON_IDEMPOTENT_METHODS)
+
+    # Credentials, timeouts etc. come from the wrapped AuthorizedHttp
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+
+class DiscordGovernor:
+    """Per-route token buckets and retries for the bot's Discord REST calls.
+
+    discord.py already waits out 429 responses; this paces our own calls per
+    route so bursts stay inside the buckets, and retries server errors with
+    backoff instead of letting a refresh or deletion fail. Non-idempotent
+    calls (sending a message) are only retried after a 429, since a 5xx may
+    come after the message was already posted.
+    """
+
+    def __init__(self, rate=1.0, capacity=5, max_retries=3, base_delay=1.0, max_delay=30):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._buckets = {}
+        self.metrics = CallMetrics()
+
+    def _bucket(self, route):
+        if route not in self._buckets:
+            self._buckets[route] = TokenBucket(self.rate, self.capacity)
+        return self._buckets[route]
+
+    # Await func(*args, **kwargs) under the bucket for `route`, e.g. ('edit', channel.id)
+    async def call(self, route, func, *args, idempotent=True, **kwargs):
+        attempt = 0
+        while True:
+            self.metrics.add('throttled_seconds', await self._bucket(route).acquire_async())
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except discord.HTTPException as e:
+                retryable = e.status == 429 or (idempotent and e.status >= 500)
+                if not retryable or attempt >= self.max_retries:
+                    self.metrics.add('failures')
+                    raise
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                print(f"Discord call {route} failed ({e.status}), retrying in {delay:.1f}s")
+                self.metrics.add('retries')
+                attempt += 1
+                await asyncio.sleep(delay)
+            finally:
+                self.metrics.observe(time.perf_counter() - start)
+
+    def stats(self):
+        return dict(self.metrics.stats(), routes=len(self._buckets))
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+
+class HealthServer:
+    """Small aiohttp server on the bot's event loop for health checks.
+
+    `/` answers as long as the event loop is serving requests, `/ready` asks
+    the `ready` callable (returning (ok, reason)) and `/metrics` returns the
+    text built by the `metrics` callable in Prometheus format.
+    """
+
+    def __init__(self, host='0.0.0.0', port=8000, ready=None, metrics=None):
+        self.host = host
+        self.port = port
+        self.ready = ready
+        self.metrics = metrics
+        self.started_at = time.monotonic()
+        self.app = web.Application()
+        self.app.router.add_get('/', self.health_check)
+        self.app.router.add_get('/ready', self.readiness)
+        self.app.router.add_get('/metrics', self.metrics_endpoint)
+
+    async def health_check(self, request):
+        return web.Response(text=f"Health Check OK (up {time.monotonic() - self.started_at:.0f}s)")
+
+    async def readiness(self, request):
+        ok, reason = self.ready() if self.ready else (True, 'ok')
+        return web.Response(text=reason, status=200 if ok else 503)
+
+    async def metrics_endpoint(self, request):
+        if self.metrics is None:
+            raise web.HTTPNotFound()
+        return web.Response(text=self.metrics(), content_type='text/plain', charset='utf-8')
+
+    # Serve until cancelled
+    async def run(self):
+        runner = web.AppRunner(self.app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+            print(f"Health server listening on {self.host}:{self.port}")
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
@@ -1,166 +1,110 @@
 import os
 import time
-import pickle
 import asyncio
-from datetime import datetime, timezone
-from typing import Optional, Type
-from cryptography.fernet import Fernet
-from flask import Flask, request, jsonify
 import threading
-import schedule
+import weakref
+from datetime import datetime, timezone
+from typing import List, Optional, Type
+
+from runtime import StartupTimings, Supervisor
+
+startup_timings = StartupTimings()
 
 import dateutil.parser
 from dotenv import load_dotenv
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.oauth2 import service_account
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 import discord
 from discord.ext import tasks
-import nest_asyncio
 from pydantic import BaseModel, Field
 
-from langchain.tools import BaseTool
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, AIMessage
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.prebuilt import create_react_agent
-
-german_months = {
-    1: "Januar", 2: "Februar", 3: "März", 4: "April", 5: "Mai", 6: "Juni",
-    7: "Juli", 8: "August", 9: "September", 10: "Oktober", 11: "November", 12: "Dezember"
-}
-app = Flask(__name__)
-
-@app.route('/')
-def health_check():
-    print("Health check endpoint called")
-    return "Health Check OK", 200
-
-def run_flask():
-    print("Starting Flask app")
-    app.run(host='0.0.0.0', port=8000)
-
-# Scopes allow us to read and write tasks
-SCOPES = ['https://www.googleapis.com/auth/tasks']
+# The LLM stack (langchain_openai, langgraph) is imported on first use, see get_agent_executor
+from langchain_core.tools import BaseTool
+
+from agent_cache import DuplicateGuard, ResponseCache, created_task_calls
+from blocking_executor import BlockingCallExecutor
+from conversation_memory import ConversationMemory
+from discord_cleanup import DeletionScheduler, purge_channel
+from fast_path import FastPathStats, normalize_message, parse_homework
+from google_client import GoogleTasksClientProvider
+from governor import CallMetrics, DiscordGovernor, RequestGovernor
+from health_server import HealthServer
+from metrics import MetricsWriter
+from overview_refresher import OverviewRegistry, PinnedOverviewPublisher
+from overview_renderer import OverviewRenderer, format_german_date
+from tasklist_index import TasklistIndex
+from task_snapshot import SnapshotCache, fold_title
+from task_history import CompletedTaskIndex, TaskHistoryView, parse_history_command
+from task_store import TaskStore
+from task_sync import TaskSyncEngine, format_rfc3339
+from timetable import Timetable
+
+startup_timings.mark('imports')
+
 load_dotenv()
 
 TOKEN = os.getenv('DISCORD_TOKEN')
 CHANNEL_NAME = 'beta_hausaufgaben'
+# Seconds the /task-history page buttons stay usable before the answer is deleted
+HISTORY_TIMEOUT = 120
 azure_token = os.getenv("AZURE_TOKEN")
 encryption_key = os.environ.get('ENCRYPTION_KEY').encode()
 
-# Decrypt token.pickle
-def decrypt_token():
-    with open("service_account.json.encrypted", "rb") as encrypted_file:
-        encrypted_data = encrypted_file.read()
-
-    fernet = Fernet(encryption_key)
-    decrypted_data = fernet.decrypt(encrypted_data)
-
-    with open("service_account.json", "wb") as decrypted_file:
-        decrypted_file.write(decrypted_data)
-        print("Decrypted token saved to service_account.json")
-
-# Authenticate using OAuth tokens
+# Every Google Tasks request is rate limited, retried with backoff and guarded by a circuit breaker
+google_governor = RequestGovernor(
+    rate=float(os.getenv('GOOGLE_RATE_LIMIT', '5')), capacity=int(os.getenv('GOOGLE_BURST', '10'))
+)
+client_provider = GoogleTasksClientProvider("service_account.json.encrypted", encryption_key, governor=google_governor)
+# Local copy of tasklists, tasks and pinned overviews, served right away after a restart
+task_store = TaskStore(os.getenv('TASK_STORE', 'tasks.sqlite'))
+tasklist_index = TasklistIndex(ttl=300, store=task_store)
+sync_engine = TaskSyncEngine(full_resync_interval=900, store=task_store, service_provider=client_provider.get_service)
+history_index = CompletedTaskIndex(task_store)
+timetable = Timetable(os.getenv('TIMETABLE_FILE', 'timetable_data_by_day.json'))
+
+# Return the cached Google Tasks service (decrypted and built once per process)
 def authenticate_google_tasks():
-    print("Authenticating with Google Tasks API using service account")
-    decrypt_token()
-    # Load the service account credentials from service_creds.json
-    service_account_file = 'service_account.json'
-    if not os.path.exists(service_account_file):
-        raise Exception(f"Service account file {service_account_file} not found.")
-    
-    creds = service_account.Credentials.from_service_account_file(service_account_file)
-    print("Service account credentials loaded successfully.")
-    
-    # Return authenticated Google Tasks API service
-    return build('tasks', 'v1', credentials=creds)
-
-# Get Task List ID by Task List Title
+    return client_provider.get_service()
+
+# Get Task List ID by Task List Title (served from the cached index)
 def get_tasklist_id_by_title(service, title):
-    print(f"Fetching tasklist ID for title: {title}")
-    result = service.tasklists().list().execute()
-    tasklists = result.get('items', [])
-    for tasklist in tasklists:
-        if tasklist['title'].lower() == title.lower():
-            print(f"Found matching tasklist ID: {tasklist['id']}")
-            return tasklist['id']
-    raise ValueError(f"Tasklist '{title}' not found")
-
-# Fetch all tasks from the tasklist
+    return tasklist_index.get_id(service, title)
+
+# Fetch all tasks from the tasklist (incrementally synced since the last call)
 def get_tasks(service, tasklist_id):
-    print(f"Fetching tasks for tasklist ID: {tasklist_id}")
-    result = service.tasks().list(tasklist=tasklist_id).execute()
-    tasks = result.get('items', [])
+    print(f"Syncing tasks for tasklist ID: {tasklist_id}")
+    tasks = sync_engine.sync(service, tasklist_id)
     print(f"Retrieved {len(tasks)} tasks")
     return tasks
 
-# Fetch pending tasks (tasks that are not completed)
-def get_pending_tasks(service, tasklist_id):
-    tasks = get_tasks(service, tasklist_id)
-    pending_tasks = []
-    now = datetime.now(timezone.utc)
-
-    for task in tasks:
-        due_date = task.get('due')
-        if task.get('status') != 'completed':  # Only display tasks that are not completed
-            if due_date:
-                due_datetime = datetime.fromisoformat(due_date[:-1] + '+00:00')
-                if due_datetime > now:
-                    pending_tasks.append({
-                        'title': task['title'],
-                        'due_date': due_datetime.strftime('%Y-%m-%d')
-                    })
-            else:
-                # Include tasks without a due date in pending tasks
-                pending_tasks.append({
-                    'title': task['title'],
-                    'due_date': 'No due date'
-                })
-
-    print(f"Total pending tasks: {len(pending_tasks)}")
-    return pending_tasks
-
-# Fetch passed tasks (tasks where the due date has passed and they are not marked as completed)
-def get_passed_tasks(service, tasklist_id):
-    tasks = get_tasks(service, tasklist_id)
-    passed_tasks = []
-    now = datetime.now(timezone.utc)
-
-    for task in tasks:
-        due_date = task.get('due')
-        if task.get('status') != 'completed':  # Only consider non-completed tasks
-            if due_date:
-                due_datetime = datetime.fromisoformat(due_date[:-1] + '+00:00')
-                if due_datetime < now:
-                    passed_tasks.append({
-                        'title': task['title'],
-                        'due_date': due_datetime.strftime('%Y-%m-%d')
-                    })
-    print(f"Total passed tasks: {len(passed_tasks)}")
-    return passed_tasks
+snapshot_cache = SnapshotCache(get_tasks, max_age=5)
 
-def display_tasks(service, tasklist_id):
-    print("Displaying tasks")
-    pending_tasks = get_pending_tasks(service, tasklist_id)
-    passed_tasks = get_passed_tasks(service, tasklist_id)
+# Return the shared snapshot of a tasklist (fetched at most once per refresh)
+def get_task_snapshot(service, tasklist_id):
+    return snapshot_cache.get(service, tasklist_id)
 
-    def format_date(date_str):
-        date_obj = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-        return f"{date_obj.day}. {german_months[date_obj.month]}"
+# Merge tasks returned by a write into the local copy and re-render the
+# overviews from it, instead of invalidating and listing the tasklist again
+def apply_written_tasks(tasklist_id, written_tasks):
+    if sync_engine.apply(tasklist_id, written_tasks):
+        snapshot_cache.replace(tasklist_id, sync_engine.tasks(tasklist_id))
+    else:
+        snapshot_cache.invalidate(tasklist_id)
+    overview_registry.request_refresh(tasklist_id)
 
-    pending_tasks_md = '\n'.join([f"- **{task['title']}** (Fällig: {format_date(task['due_date'])})" for task in pending_tasks])
-    passed_tasks_md = '\n'.join([f"- __{task['title']}__ (War fällig: {format_date(task['due_date'])})" for task in passed_tasks])
+# Serve the tasklists saved by the previous run until they have been synced again
+def load_local_tasks():
+    for tasklist in task_store.tasklists():
+        if sync_engine.load_local(tasklist['id']):
+            snapshot_cache.replace(tasklist['id'], sync_engine.tasks(tasklist['id']))
 
-    message = (
-        "### Aufgabenübersicht\n"
-        f"**Ausstehende Aufgaben:**\n{pending_tasks_md if pending_tasks_md else 'Keine ausstehenden Aufgaben.'}\n\n"
-        f"**Vergangene Aufgaben:**\n{passed_tasks_md if passed_tasks_md else 'Keine vergangenen Aufgaben.'}\n\n"
-    )
-    
-    print("Generated tasks overview message")
-    return message
+overview_renderer = OverviewRenderer()
+
+# Render the pinned overview of a tasklist as a list of message pages
+def display_tasks(service, tasklist_id):
+    print("Displaying tasks")
+    snapshot = get_task_snapshot(service, tasklist_id)
+    pages = overview_renderer.render(snapshot)
+    print(f"Generated tasks overview in {len(pages)} page(s)")
+    return pages
 
 # Define the input schema for creating a task
 class CreateTaskInput(BaseModel):
@@ -168,6 +112,145 @@ class CreateTaskInput(BaseModel):
     due_date: Optional[str] = Field(default=None, description="Due date in RFC3339 or other common date formats, None if no due date")
     priority: Optional[str] = Field(default=None, description="Priority level of the task")
     description: Optional[str] = Field(default=None, description="Description of the task")
+    subject: Optional[str] = Field(default=None, description="School subject of the task; without a due date the task is due at the next lesson of this subject")
+
+# Date of the next lesson of a subject in the timetable, None if it has no
+# lessons; counted from now, or from midnight of `today` when that is a later
+# day than the timetable's current date
+def next_lesson_date(subject, today=None):
+    after = None
+    if today is not None and today > datetime.now(timetable.tz).date():
+        after = datetime.combine(today, datetime.min.time(), tzinfo=timetable.tz)
+    lesson = timetable.next_lesson(subject, after)
+    return lesson.date() if lesson else None
+
+# Build the Google Tasks body for a new task, validating the due date
+def build_task_body(task_title, due_date=None, priority=None, description=None, subject=None):
+    # Default the due date to the next lesson of the subject
+    if not due_date and subject:
+        lesson_date = next_lesson_date(subject)
+        if lesson_date:
+            due_date = lesson_date.isoformat()
+
+    parsed_due_date = None
+    if due_date:
+        try:
+            parsed_due_date = datetime.fromisoformat(due_date).isoformat()
+        except ValueError:
+            try:
+                parsed_due_date = dateutil.parser.parse(due_date).isoformat()
+            except ValueError:
+                raise ValueError("Invalid due date format. Please provide a valid date.")
+    task_body = {'title': task_title}
+    if parsed_due_date:
+        task_body['due'] = parsed_due_date
+    if priority:
+        task_body['notes'] = f"Priority: {priority}"
+    if description:
+        task_body['notes'] = (task_body.get('notes', '') + f"\nDescription: {description}").strip()
+    return task_body
+
+duplicate_guard = DuplicateGuard(cutoff=0.85)
+
+# Due date of a task body as a date, None if it has none
+def body_due_date(task_body):
+    return datetime.fromisoformat(task_body['due']).date() if 'due' in task_body else None
+
+# Open task that a new task body would repeat, or None; an unreadable
+# tasklist never blocks the insert
+def find_duplicate_task(service, tasklist_id, task_body):
+    try:
+        snapshot = get_task_snapshot(service, tasklist_id)
+    except Exception as e:
+        print(f"Duplicate check skipped: {e!r}")
+        return None
+    return duplicate_guard.find(snapshot, task_body['title'], body_due_date(task_body))
+
+# Insert a task into the "Schule" tasklist unless it repeats an open task;
+# returns (task, created), where task is the open task when it was skipped
+def insert_task(service, task_title, due_date=None, priority=None, description=None, subject=None):
+    tasklist_id = get_tasklist_id_by_title(service, "Schule")
+    task_body = build_task_body(task_title, due_date, priority, description, subject)
+    duplicate = find_duplicate_task(service, tasklist_id, task_body)
+    if duplicate is not None:
+        return duplicate, False
+    task = service.tasks().insert(tasklist=tasklist_id, body=task_body).execute()
+    apply_written_tasks(tasklist_id, [task])
+    print(f"Created task with ID: {task['id']}")
+    return task, True
+
+# Create a new task in the "Schule" tasklist (used by the tool)
+def create_task(service, task_title, due_date=None, priority=None, description=None, subject=None):
+    task, created = insert_task(service, task_title, due_date, priority, description, subject)
+    if not created:
+        return f"Task '{task_title}' already exists with ID: {task['id']}"
+    return f"Created task '{task_title}' with ID: {task['id']}"
+
+# Create the tasks an earlier agent run parsed from the same message; the
+# duplicate check runs against the current tasklist
+def replay_task_calls(service, calls):
+    replies = []
+    for call in calls:
+        task, created = insert_task(service, call['task_title'], call.get('due_date'), call.get('priority'),
+                                    call.get('description'), call.get('subject'))
+        if created:
+            replies.append(f"Aufgabe '{call['task_title']}' erstellt.")
+        else:
+            replies.append(f"Aufgabe '{call['task_title']}' ist schon eingetragen.")
+    return ' '.join(replies)
+
+# Google allows up to 1000 calls per batch request but recommends small batches
+BATCH_SIZE = 50
+
+# Send the requests in batch HTTP calls; returns (response, exception) per request
+def execute_batched(service, requests):
+    outcomes = [None] * len(requests)
+
+    def collect(request_id, response, exception):
+        outcomes[int(request_id)] = (response, exception)
+
+    for start in range(0, len(requests), BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=collect)
+        for index in range(start, min(start + BATCH_SIZE, len(requests))):
+            batch.add(requests[index], request_id=str(index))
+        batch.execute()
+    return outcomes
+
+# Create several tasks in the "Schule" tasklist with batch requests
+def create_tasks(service, task_inputs):
+    tasklist_id = get_tasklist_id_by_title(service, "Schule")
+    results = [None] * len(task_inputs)
+
+    # Validate everything up front so one bad date does not block the rest;
+    # tasks that repeat an open task or an earlier one in the batch are skipped
+    pending = []
+    seen = set()
+    for index, task_input in enumerate(task_inputs):
+        try:
+            body = build_task_body(task_input.task_title, task_input.due_date, task_input.priority, task_input.description, task_input.subject)
+            key = (fold_title(body['title']), body_due_date(body))
+            duplicate = find_duplicate_task(service, tasklist_id, body)
+            if duplicate is not None or key in seen:
+                existing = f" with ID: {duplicate['id']}" if duplicate is not None else " in this batch"
+                results[index] = f"Task '{task_input.task_title}' already exists{existing}"
+                continue
+            seen.add(key)
+            pending.append((index, service.tasks().insert(tasklist=tasklist_id, body=body)))
+        except ValueError as e:
+            results[index] = f"Failed to create task '{task_input.task_title}': {e}"
+
+    outcomes = execute_batched(service, [request for _, request in pending])
+    created = []
+    for (index, _), (task, exception) in zip(pending, outcomes):
+        title = task_inputs[index].task_title
+        if exception is not None:
+            results[index] = f"Failed to create task '{title}': {exception}"
+        else:
+            results[index] = f"Created task '{title}' with ID: {task['id']}"
+            created.append(task)
+    apply_written_tasks(tasklist_id, created)
+    print(f"Created {len(pending)} tasks in batch")
+    return results
 
 # Define the custom tool for creating a task in Google Tasks
 class CreateTaskTool(BaseTool):
@@ -177,32 +260,11 @@ class CreateTaskTool(BaseTool):
     return_direct: bool = False
 
     def _run(
-        self, task_title: str, due_date: Optional[str] = None, priority: Optional[str] = None, description: Optional[str] = None, run_manager: Optional = None
+        self, task_title: str, due_date: Optional[str] = None, priority: Optional[str] = None, description: Optional[str] = None, subject: Optional[str] = None, run_manager: Optional = None
     ) -> str:
         """Create a new task in Google Tasks."""
         service = authenticate_google_tasks()
-
-        tasklist_id = get_tasklist_id_by_title(service, "Schule")
-
-        parsed_due_date = None
-        if due_date:
-            try:
-                parsed_due_date = datetime.fromisoformat(due_date).isoformat()
-            except ValueError:
-                try:
-                    parsed_due_date = dateutil.parser.parse(due_date).isoformat()
-                except ValueError:
-                    raise ValueError("Invalid due date format. Please provide a valid date.")
-        task_body = {'title': task_title}
-        if parsed_due_date:
-            task_body['due'] = parsed_due_date
-        if priority:
-            task_body['notes'] = f"Priority: {priority}"
-        if description:
-            task_body['notes'] = (task_body.get('notes', '') + f"\nDescription: {description}").strip()
-        task = service.tasks().insert(tasklist=tasklist_id, body=task_body).execute()
-        print(f"Created task with ID: {task['id']}")
-        return f"Created task '{task_title}' with ID: {task['id']}"
+        return create_task(service, task_title, due_date=due_date, priority=priority, description=description, subject=subject)
 
 # Define the input schema for getting the current date
 class GetCurrentDateInput(BaseModel):
@@ -224,9 +286,47 @@ class GetCurrentDateTool(BaseTool):
             date_str = current_date.strftime(format)
         return date_str
 
+# Define the input schema for creating several tasks at once
+class CreateTasksInput(BaseModel):
+    tasks: List[CreateTaskInput] = Field(description="Tasks to create")
+
+# Define the custom tool for creating several tasks in one batch request
+class CreateTasksTool(BaseTool):
+    name: str = "create_tasks"
+    description: str = "Tool for creating several tasks at once in Google Tasks. Use it when a message contains more than one assignment."
+    args_schema: Type[BaseModel] = CreateTasksInput
+    return_direct: bool = False
+
+    def _run(self, tasks: List[CreateTaskInput], run_manager: Optional = None) -> str:
+        """Create several tasks in Google Tasks with one batch request."""
+        service = authenticate_google_tasks()
+        tasks = [CreateTaskInput.model_validate(task) if isinstance(task, dict) else task for task in tasks]
+        return "\n".join(create_tasks(service, tasks))
+
+# Define the input schema for looking up the next lesson of a subject
+class GetNextLessonInput(BaseModel):
+    subject: str = Field(description="School subject, e.g. Mathe, Deutsch, PoWi")
+    after: Optional[str] = Field(default=None, description="Only consider lessons after this date/time (RFC3339), default now")
+
+# Define the custom tool for looking up the next lesson in the timetable
+class GetNextLessonTool(BaseTool):
+    name: str = "get_next_lesson"
+    description: str = "Tool for finding the date and time of the next lesson of a subject in the timetable."
+    args_schema: Type[BaseModel] = GetNextLessonInput
+    return_direct: bool = False
+
+    def _run(self, subject: str, after: Optional[str] = None, run_manager: Optional = None) -> str:
+        """Get the start of the next lesson of a subject."""
+        lesson = timetable.next_lesson(subject, dateutil.parser.parse(after) if after else None)
+        if lesson is None:
+            return f"No lessons found for subject '{subject}'."
+        return lesson.isoformat()
+
 # Instantiate the tools
 create_task_tool = CreateTaskTool()
+create_tasks_tool = CreateTasksTool()
 get_current_date_tool = GetCurrentDateTool()
+get_next_lesson_tool = GetNextLessonTool()
 
 
 # Define the input schema for getting pending and passed tasks
@@ -235,19 +335,15 @@ class GetPendingAndPassedTasksInput(BaseModel):
 
 # Fetch all tasks (pending and passed) with their task IDs
 def get_pending_and_passed_tasks(service, tasklist_id):
-    tasks = get_tasks(service, tasklist_id)
-    now = datetime.now(timezone.utc)
-    pending_passed_tasks = []
-
-    for task in tasks:
-        due_date = task.get('due')
-        if task.get('status') != 'completed':  # Only consider non-completed tasks
-            task_entry = {
-                'title': task['title'],
-                'id': task['id'],  # Include the task ID
-                'due_date': due_date if due_date else 'No due date'
-            }
-            pending_passed_tasks.append(task_entry)
+    snapshot = get_task_snapshot(service, tasklist_id)
+    pending_passed_tasks = [
+        {
+            'title': task['title'],
+            'id': task['id'],  # Include the task ID
+            'due_date': task['due'].isoformat() if task['due'] else 'No due date'
+        }
+        for task in snapshot.open_tasks
+    ]
 
     print(f"Retrieved {len(pending_passed_tasks)} pending or passed tasks.")
     return pending_passed_tasks
@@ -279,32 +375,30 @@ class GetPendingAndPassedTasksTool(BaseTool):
 
         return f"Pending and Passed Tasks in {tasklist_title}:\n{task_list_output}"
 
-# Mark a task as completed
+# Mark a task as completed with a single PATCH of its status
 def mark_task_complete(service, tasklist_id, task_id):
     print(f"Marking task {task_id} as complete in tasklist {tasklist_id}")
-    # Set the task status to 'completed'
-    task = service.tasks().get(tasklist=tasklist_id, task=task_id).execute()
-    task['status'] = 'completed'
-    updated_task = service.tasks().update(tasklist=tasklist_id, task=task_id, body=task).execute()
+    body = {'status': 'completed', 'completed': format_rfc3339(datetime.now(timezone.utc))}
+    updated_task = service.tasks().patch(tasklist=tasklist_id, task=task_id, body=body).execute()
+    apply_written_tasks(tasklist_id, [updated_task])
     print(f"Task {task_id} marked as completed.")
     return updated_task
 
 # Mark a task as completed using either its ID or title
 def mark_task_complete_by_id_or_title(service, tasklist_id, task_title=None, task_id=None):
-    tasks = get_pending_and_passed_tasks(service, tasklist_id)
+    snapshot = get_task_snapshot(service, tasklist_id)
 
     # If task ID is provided, find the task directly
     if task_id:
-        for task in tasks:
-            if task['id'] == task_id:
-                return mark_task_complete(service, tasklist_id, task_id)
+        if snapshot.find_by_id(task_id):
+            return mark_task_complete(service, tasklist_id, task_id)
         return f"Task with ID '{task_id}' not found."
 
-    # If task title is provided, find the task by title
+    # If task title is provided, find the task by title (case, accents and small typos ignored)
     elif task_title:
-        for task in tasks:
-            if task['title'].lower() == task_title.lower():
-                return mark_task_complete(service, tasklist_id, task['id'])
+        task = snapshot.find_by_title(task_title)
+        if task:
+            return mark_task_complete(service, tasklist_id, task['id'])
         return f"Task with title '{task_title}' not found."
 
     return "Please provide either a task title or task ID."
@@ -333,8 +427,57 @@ class CompleteTaskTool(BaseTool):
         
         return result
 
+# Mark several tasks as completed with batch requests, by ID or title
+def mark_tasks_complete(service, tasklist_id, task_ids=(), task_titles=()):
+    snapshot = get_task_snapshot(service, tasklist_id)
+
+    results = []
+    targets = []
+    for task_id in task_ids:
+        if snapshot.find_by_id(task_id):
+            targets.append((task_id, task_id))
+        else:
+            results.append(f"Task with ID '{task_id}' not found.")
+    for task_title in task_titles:
+        task = snapshot.find_by_title(task_title)
+        if task:
+            targets.append((task['title'], task['id']))
+        else:
+            results.append(f"Task with title '{task_title}' not found.")
+
+    body = {'status': 'completed', 'completed': format_rfc3339(datetime.now(timezone.utc))}
+    requests = [service.tasks().patch(tasklist=tasklist_id, task=task_id, body=body) for _, task_id in targets]
+    completed = []
+    for (label, _), (task, exception) in zip(targets, execute_batched(service, requests)):
+        if exception is not None:
+            results.append(f"Failed to complete task '{label}': {exception}")
+        else:
+            results.append(f"Task '{label}' marked as completed.")
+            completed.append(task)
+    apply_written_tasks(tasklist_id, completed)
+    return results
+
+# Define the input schema for completing several tasks at once
+class CompleteTasksInput(BaseModel):
+    task_titles: List[str] = Field(default_factory=list, description="Titles of the tasks to complete")
+    task_ids: List[str] = Field(default_factory=list, description="IDs of the tasks to complete")
+
+# Define the custom tool for completing several tasks in one batch request
+class CompleteTasksTool(BaseTool):
+    name: str = "complete_tasks"
+    description: str = "Tool to mark several tasks as completed (deleted) at once by their IDs or titles."
+    args_schema: Type[BaseModel] = CompleteTasksInput
+    return_direct: bool = False
+
+    def _run(self, task_titles: Optional[List[str]] = None, task_ids: Optional[List[str]] = None, run_manager: Optional = None) -> str:
+        """Mark several tasks as complete using their titles or IDs."""
+        service = authenticate_google_tasks()
+        tasklist_id = get_tasklist_id_by_title(service, "Schule")
+        return "\n".join(mark_tasks_complete(service, tasklist_id, task_ids=task_ids or [], task_titles=task_titles or []))
+
 # Instantiate the tool
 complete_task_tool = CompleteTaskTool()
+complete_tasks_tool = CompleteTasksTool()
 # Instantiate the tool
 get_pending_tasks_tool = GetPendingAndPassedTasksTool()
 
@@ -347,21 +490,39 @@ create a corresponding task with all provided details, and fit short info into t
 Determine exact due dates from relative terms using the current date in RFC3339 format None if no due date is given. 
 Debug and retry if issues arise. Always use the same language as the user."""
 
-# Initialize the language model
-llm = ChatOpenAI(
-    model_name=model_name,
-    base_url=endpoint,
-    api_key=azure_token
-)
-
-# Initialize memory saver
-memory = MemorySaver()
-
-# Create the agent executor
-tools = [get_current_date_tool, create_task_tool, complete_task_tool, get_pending_tasks_tool]
-agent_executor = create_react_agent(
-    llm, tools, checkpointer=memory, state_modifier=system_prompt
-)
+# Tools available to the agent
+tools = [
+    get_current_date_tool, get_next_lesson_tool, create_task_tool, create_tasks_tool,
+    complete_task_tool, complete_tasks_tool, get_pending_tasks_tool,
+]
+
+# Built by get_agent_executor on the first message that needs the LLM
+agent_executor = None
+conversation_memory = None
+agent_lock = threading.Lock()
+
+# Build the language model, conversation memory and agent once; importing
+# langchain_openai and langgraph alone takes seconds, so this waits until needed
+def get_agent_executor():
+    global agent_executor, conversation_memory
+    with agent_lock:
+        if agent_executor is None:
+            started = time.perf_counter()
+            from langchain_openai import ChatOpenAI
+            from langgraph.prebuilt import create_react_agent
+
+            llm = ChatOpenAI(model_name=model_name, base_url=endpoint, api_key=azure_token)
+            # Persistent, bounded conversation memory (one thread per channel and user)
+            conversation_memory = ConversationMemory(
+                db_path=os.getenv('CONVERSATION_DB', 'conversations.sqlite'),
+                max_messages=int(os.getenv('CONVERSATION_MAX_MESSAGES', '20')),
+            )
+            agent_executor = create_react_agent(
+                llm, tools, checkpointer=conversation_memory.checkpointer, prompt=conversation_memory.prompt(system_prompt)
+            )
+            startup_timings.mark('agent_ready')
+            print(f"Built agent in {time.perf_counter() - started:.2f}s")
+        return agent_executor
 
 # Initialize the Discord Bot
 print("Initializing Discord bot")
@@ -371,23 +532,87 @@ intents.guilds = True
 intents.message_content = True
 
 bot = discord.Client(intents=intents)
-service = authenticate_google_tasks()
-tasklist_id = None
-pinned_message_id = None  # Store the pinned message ID to update it
-
+discord_governor = DiscordGovernor()  # Per-route pacing and retries for Discord calls
+deletion_scheduler = DeletionScheduler(bot, governor=discord_governor)
+background_tasks = set()  # Keep references to fire-and-forget tasks
+overview_publisher = PinnedOverviewPublisher(governor=discord_governor)
+fast_path_stats = FastPathStats()
+llm_metrics = CallMetrics()  # Duration of agent invocations
+# Replies to repeated homework posts, keyed by the normalised message
+response_cache = ResponseCache(
+    max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', '256')), ttl=int(os.getenv('RESPONSE_CACHE_TTL', '600')),
+)
 
-# Example function to send a message to the agent
-def agent_send_message(message):
+# Bounded worker pools for the blocking LLM and Google API calls
+blocking_executor = BlockingCallExecutor({
+    'llm': int(os.getenv('LLM_CONCURRENCY', '4')),
+    'google': int(os.getenv('GOOGLE_CONCURRENCY', '8')),
+})
+
+# Run a blocking Google Tasks helper off the event loop with the worker thread's client
+async def run_google(func, *args):
+    return await blocking_executor.run('google', lambda: func(authenticate_google_tasks(), *args))
+
+# Render the overview of a tasklist, from a fresh snapshot if there is one
+# and on the Google worker pool otherwise
+async def render_overview(tasklist_id):
+    snapshot = snapshot_cache.peek(tasklist_id)
+    if snapshot is not None:
+        return overview_renderer.render(snapshot)
+    return await run_google(display_tasks, tasklist_id)
+
+# Resolve a tasklist title to its ID, from the local store if it is known there
+async def resolve_tasklist(title):
+    tasklist_id = task_store.tasklist_id(title)
+    if tasklist_id is not None:
+        return tasklist_id
+    return await run_google(get_tasklist_id_by_title, title)
+
+# Pinned overviews: channel name -> tasklist title, polled every 10s to 5min depending on activity
+overview_registry = OverviewRegistry(
+    bot, overview_publisher, render_overview, resolve_tasklist,
+    min_interval=int(os.getenv('REFRESH_MIN_INTERVAL', '10')),
+    max_interval=int(os.getenv('REFRESH_MAX_INTERVAL', '300')),
+    store=task_store,
+)
+overview_registry.add(CHANNEL_NAME, "Schule")
+overview_registry.add("private-tasks", "My Tasks")
+
+# One agent run per conversation thread at a time, since concurrent runs would
+# read the same checkpoint. Runs wait on the event loop, not in an llm worker;
+# a thread's lock disappears once nobody holds or waits for it.
+agent_thread_locks = weakref.WeakValueDictionary()
+
+def agent_thread_lock(thread_id):
+    lock = agent_thread_locks.get(thread_id)
+    if lock is None:
+        lock = agent_thread_locks[thread_id] = asyncio.Lock()
+    return lock
+
+# Example function to send a message to the agent; callers hold agent_thread_lock(thread_id)
+def agent_send_message(message, thread_id="default"):
+    from langchain_core.messages import HumanMessage
     print(f"Sending message to agent: {message}")
+    agent = get_agent_executor()
     human_message = HumanMessage(content=message)
-    response = agent_executor.invoke(
-        {"messages": [human_message]},
-        config={"configurable": {"thread_id": "default", "recursion_limit": 1000}},
-    )
+    conversation_memory.touch(thread_id)
+    start = time.perf_counter()
+    try:
+        response = agent.invoke(
+            {"messages": [human_message]},
+            config={"configurable": {"thread_id": thread_id, "recursion_limit": 1000}},
+        )
+    except Exception:
+        llm_metrics.add('failures')
+        raise
+    finally:
+        llm_metrics.observe(time.perf_counter() - start)
+    conversation_memory.trim(agent, thread_id)
     return response
 
 # Function to extract the most recent message content and tool calls from the agent's response
 def get_most_recent_ai_message_content_and_tool_calls(response):
+    from langchain_core.messages import AIMessage, HumanMessage
     messages = response.get('messages', [])
     most_recent_content = None
     tool_calls = []
@@ -403,27 +628,63 @@ def get_most_recent_ai_message_content_and_tool_calls(response):
 
     return most_recent_content, tool_calls
 
+# Messages removed from the channel on startup
+def is_purgeable(msg):
+    return not msg.pinned and not msg.content.startswith('### Pinned Tasks')
+
+# Load the Google client, tasklists and timetable (and optionally the agent) after connecting
+async def warm_up():
+    try:
+        await run_google(get_tasklist_id_by_title, "Schule")
+        startup_timings.mark('google_ready')
+        await blocking_executor.run('google', timetable.subjects)
+        startup_timings.mark('timetable_ready')
+        if os.getenv('PRELOAD_AGENT') == '1':
+            await blocking_executor.run('llm', get_agent_executor)
+    except Exception as e:
+        print(f"Warm-up failed: {e!r}")
+
+# Answer /task-history [N] [subject] with the last completed tasks, paged with buttons
+async def show_task_history(message, content):
+    limit, subject = parse_history_command(content)
+    tasklist_id = await resolve_tasklist("Schule")
+    try:
+        await run_google(history_index.refresh, tasklist_id)
+    except Exception as e:
+        # Answer from the stored history when Google is unavailable
+        print(f"Refreshing the task history failed: {e!r}")
+    completed = await blocking_executor.run('google', history_index.query, tasklist_id, limit, subject)
+    view = TaskHistoryView(completed, subject=subject, timeout=HISTORY_TIMEOUT)
+    bot_message = await discord_governor.call(
+        ('send', message.channel.id), message.channel.send, view.content(), view=view, idempotent=False,
+    )
+    deletion_scheduler.schedule(bot_message, delay=HISTORY_TIMEOUT)
+    deletion_scheduler.schedule(message, delay=HISTORY_TIMEOUT)
+
 @bot.event
 async def on_ready():
-    global tasklist_id, private_tasklist_id
+    started_at = discord.utils.utcnow()  # Only messages from before this are purged
     print(f'Logged in as {bot.user}')
+    startup_timings.mark('discord_ready')
+    deletion_scheduler.start()
+    warm_up_task = asyncio.create_task(warm_up())
+    background_tasks.add(warm_up_task)
+    warm_up_task.add_done_callback(background_tasks.discard)
+    # Clear old messages in the background so the overview refresh starts right away
     for guild in bot.guilds:
         for channel in guild.text_channels:
             if channel.name == CHANNEL_NAME:
-                try:
-                    async for msg in channel.history(limit=None):
-                        if not msg.pinned and not msg.content.startswith('### Pinned Tasks'):
-                            print(f"Deleting message: {msg.content}")
-                            await msg.delete()
-                except discord.Forbidden:
-                    print(f"Permission error: Cannot delete messages in {channel.name}")
-                except discord.HTTPException as e:
-                    print(f"HTTP error: {e} while deleting messages in {channel.name}")
-                except Exception as e:
-                    print(f"Unexpected error: {e} while deleting messages in {channel.name}")
-    tasklist_id = get_tasklist_id_by_title(service, "Schule")  # Set the task list ID for "Schule"
-    private_tasklist_id = get_tasklist_id_by_title(service, "My Tasks")  # Set the task list ID for "My Tasks"
-    update_tasks.start()  # Start updating tasks every minute
+                purge_task = asyncio.create_task(purge_channel(channel, check=is_purgeable, before=started_at))
+                background_tasks.add(purge_task)
+                purge_task.add_done_callback(background_tasks.discard)
+    try:
+        await blocking_executor.run('google', load_local_tasks)
+        startup_timings.mark('local_tasks_loaded')
+        await overview_registry.resolve()  # Unresolved bindings are retried by the refresh loop
+        startup_timings.mark('overviews_resolved')
+    finally:
+        if not update_tasks.is_running():
+            update_tasks.start()  # Refresh the overviews when due or after a write
 
 @bot.event
 async def on_message(message):
@@ -435,115 +696,178 @@ async def on_message(message):
         print(f"Received message: {content}")
 
         if content.startswith('/task-history'):
-            bot_message = await message.channel.send(f"### Last 10 Completed Tasks\n TODO: Implement this feature")
-            await asyncio.sleep(10)
-            await bot_message.delete()
-            await message.delete()
+            await show_task_history(message, content)
             return
 
-        # Pass the user message to the agent
-        print("Passing message to agent")
-        response = agent_send_message(message.content)
-        agent_message, tool_calls = get_most_recent_ai_message_content_and_tool_calls(response)
+        # Create plain homework messages directly, without the LLM
+        started_at = time.perf_counter()
+        today = datetime.now(timetable.tz).date()  # The school's date, not the server's
+        parsed = parse_homework(message.content, today=today, next_lesson=next_lesson_date)
+        if parsed.confident:
+            print(f"Fast path: '{parsed.title}' due {parsed.due_date} (confidence {parsed.confidence})")
+            try:
+                task, created = await run_google(insert_task, parsed.title, parsed.due_date.isoformat())
+            except Exception as e:
+                # Google is unavailable even after retries: keep the message so it can be resent
+                print(f"Creating task '{parsed.title}' failed: {e!r}")
+                await discord_governor.call(
+                    ('send', message.channel.id), message.channel.send,
+                    f"**Agent Response:** Google Tasks ist gerade nicht erreichbar, bitte später erneut senden. ({e})",
+                    idempotent=False,
+                )
+                return
+            if not created:
+                if parsed.language == 'en':
+                    agent_message = f"Task '{task['title']}' already exists, due {parsed.due_date.strftime('%B %d')}."
+                else:
+                    agent_message = f"Aufgabe '{task['title']}' ist schon eingetragen, fällig am {format_german_date(parsed.due_date)}."
+            elif parsed.language == 'en':
+                agent_message = f"Created task '{parsed.title}' due {parsed.due_date.strftime('%B %d')}."
+            else:
+                agent_message = f"Aufgabe '{parsed.title}' erstellt, fällig am {format_german_date(parsed.due_date)}."
+            fast_path_stats.record('fast', started_at)
+        else:
+            # Pass the user message to the agent
+            print("Passing message to agent")
+            # A repeated post of the same assignment replays the tasks parsed from the first one
+            cache_key = normalize_message(message.content, today=today)
+            cached_calls = response_cache.get(cache_key)
+            agent_message = None
+            if cached_calls is not None:
+                print("Replaying tasks from the response cache")
+                try:
+                    agent_message = await run_google(replay_task_calls, cached_calls)
+                except Exception as e:
+                    print(f"Replaying cached tasks failed ({e!r}), passing the message to the agent")
+            if agent_message is None:
+                thread_id = ConversationMemory.thread_id_for(message)
+                async with agent_thread_lock(thread_id):
+                    response = await blocking_executor.run('llm', agent_send_message, message.content, thread_id)
+                agent_message, tool_calls = get_most_recent_ai_message_content_and_tool_calls(response)
+                task_calls = created_task_calls(response.get('messages', []))
+                if task_calls:
+                    response_cache.put(cache_key, task_calls)
+            fast_path_stats.record('agent', started_at)
 
         # Send agent response back to the Discord channel
-        bot_message = await message.channel.send(f"**Agent Response:** {agent_message}")
-        await asyncio.sleep(30)  # Optionally delete messages after 30 seconds
-        await message.delete()
-        await bot_message.delete()
+        bot_message = await discord_governor.call(
+            ('send', message.channel.id), message.channel.send, f"**Agent Response:** {agent_message}",
+            idempotent=False,
+        )
+        # Delete both messages after 30 seconds without holding the handler
+        deletion_scheduler.schedule(message, delay=30)
+        deletion_scheduler.schedule(bot_message, delay=30)
 
-@tasks.loop(seconds=10)  # Loop to update tasks every 10 seconds
+@tasks.loop(seconds=0)  # refresh_due waits for the next due overview itself
 async def update_tasks():
-    global pinned_message_id, private_pinned_message_id
-    for guild in bot.guilds:
-        for channel in guild.text_channels:
-            if channel.name == CHANNEL_NAME:
-                print(f"Updating tasks in channel: {channel.name}")
-                # Fetch the current pinned message
-                if pinned_message_id is None:
-                    print("No pinned message ID, searching for pinned message")
-                    async for msg in channel.history(limit=10):
-                        if msg.pinned and msg.author == bot.user and msg.content.startswith('### Aufgabenübersicht'):
-                            pinned_message_id = msg.id
-                            print(f"Found pinned message with ID: {pinned_message_id}")
-                            break
-
-                # Get the latest tasks overview for "Schule"
-                tasks_overview = display_tasks(service, tasklist_id)
-
-                # If we have a pinned message, update it
-                if pinned_message_id:
-                    print(f"Updating pinned message ID: {pinned_message_id}")
-                    pinned_message = await channel.fetch_message(pinned_message_id)
-                    await pinned_message.edit(content=tasks_overview)
-                else:
-                    # If no pinned message exists, create a new one
-                    print("Creating new pinned message")
-                    bot_message = await channel.send(tasks_overview)
-                    await bot_message.pin()
-                    pinned_message_id = bot_message.id
-
-            elif channel.name == "private-tasks":
-                print(f"Updating tasks in channel: {channel.name}")
-                # Fetch the current pinned message
-                if private_pinned_message_id is None:
-                    print("No private pinned message ID, searching for pinned message")
-                    async for msg in channel.history(limit=10):
-                        if msg.pinned and msg.author == bot.user and msg.content.startswith('### Aufgabenübersicht'):
-                            private_pinned_message_id = msg.id
-                            print(f"Found private pinned message with ID: {private_pinned_message_id}")
-                            break
-
-                # Get the latest tasks overview for "My Tasks"
-                private_tasks_overview = display_tasks(service, private_tasklist_id)
-
-                # If we have a pinned message, update it
-                if private_pinned_message_id:
-                    print(f"Updating private pinned message ID: {private_pinned_message_id}")
-                    private_pinned_message = await channel.fetch_message(private_pinned_message_id)
-                    await private_pinned_message.edit(content=private_tasks_overview)
-                else:
-                    # If no pinned message exists, create a new one
-                    print("Creating new private pinned message")
-                    private_bot_message = await channel.send(private_tasks_overview)
-                    await private_bot_message.pin()
-                    private_pinned_message_id = private_bot_message.id
-
-async def start_bot():
+    if await overview_registry.refresh_due():
+        startup_timings.mark('first_refresh')
+
+# Keep the refresh loop alive through anything refresh_all did not catch
+@update_tasks.error
+async def update_tasks_error(error):
+    print(f"Overview refresh failed: {error!r}, restarting the loop")
+    update_tasks.restart()
+
+# Overviews may be this many seconds past their poll interval before /ready fails
+READY_MAX_REFRESH_AGE = 120
+
+# Ready once the gateway is connected and every overview has refreshed recently
+def readiness():
+    if not bot.is_ready() or bot.is_closed():
+        return False, "Discord client not connected"
+    now = time.monotonic()
+    for target in overview_registry.targets.values():
+        if target.last_success is None or now - target.last_success > target.interval + READY_MAX_REFRESH_AGE:
+            return False, f"Overview for {target.tasklist_title} in channel {target.channel_id} is stale"
+    return True, "Ready"
+
+# Prometheus metrics for /metrics
+def collect_metrics():
+    writer = MetricsWriter()
+    writer.sample('discord_ready', int(bot.is_ready() and not bot.is_closed()), help_text='Gateway connected')
+    if bot.is_ready() and bot.latency != float('inf'):
+        writer.sample('discord_latency_seconds', bot.latency, help_text='Gateway heartbeat latency')
+
+    now = time.monotonic()
+    for target in overview_registry.targets.values():
+        labels = {'channel': target.channel_id, 'tasklist': target.tasklist_title}
+        if target.last_success is not None:
+            writer.sample('overview_last_success_age_seconds', now - target.last_success,
+                          help_text='Seconds since the overview was last refreshed', **labels)
+        writer.sample('overview_failing', int(target.last_error is not None), **labels)
+        writer.sample('overview_poll_interval_seconds', target.interval, **labels)
+    writer.sample('overview_refreshes_total', overview_registry.refreshes, kind='counter')
+    writer.sample('overview_failures_total', overview_registry.failures, kind='counter')
+    writer.sample('overview_triggered_refreshes_total', overview_registry.triggered, kind='counter')
+    writer.stats('overview_publisher', overview_publisher.stats())
+    writer.stats('overview_renderer', overview_renderer.stats())
+
+    for api, api_governor in (('google', google_governor), ('discord', discord_governor)):
+        stats = api_governor.stats()
+        writer.histogram('request_duration_seconds', stats['latency_buckets'], stats['latency_sum'],
+                         help_text='Duration of API requests', api=api)
+        for key in ('retries', 'failures', 'rejected'):
+            writer.sample(f'request_{key}_total', stats[key], kind='counter', api=api)
+        writer.sample('request_throttled_seconds_total', stats['throttled_seconds'], kind='counter', api=api)
+    writer.sample('google_circuit_open', int(google_governor.breaker.is_open), help_text='Google circuit breaker state')
+
+    llm_stats = llm_metrics.stats()
+    writer.histogram('llm_call_duration_seconds', llm_stats['latency_buckets'], llm_stats['latency_sum'],
+                     help_text='Duration of agent invocations')
+    writer.sample('llm_call_failures_total', llm_stats['failures'], kind='counter')
+
+    for kind, stats in blocking_executor.stats().items():
+        writer.sample('executor_queue_depth', stats['queued'], help_text='Calls waiting for a worker', pool=kind)
+        writer.sample('executor_running', stats['running'], pool=kind)
+        writer.sample('executor_completed_total', stats['completed'], kind='counter', pool=kind)
+
+    for name, cache_stats, hits, misses in (
+        ('snapshot_cache', snapshot_cache.stats(), 'hits', 'fetches'),
+        ('tasklist_index', tasklist_index.stats(), 'hits', 'misses'),
+    ):
+        writer.stats(name, cache_stats)
+        total = cache_stats[hits] + cache_stats[misses]
+        writer.sample('cache_hit_ratio', cache_stats[hits] / total if total else 0.0, cache=name)
+    writer.stats('task_sync', sync_engine.stats())
+    writer.stats('task_store', task_store.stats())
+    writer.stats('task_history', history_index.stats())
+    writer.stats('agent_response_cache', response_cache.stats())
+    writer.stats('duplicate_tasks', duplicate_guard.stats())
+    writer.stats('fast_path', fast_path_stats.stats())
+    writer.stats('google_client', client_provider.stats())
+    if conversation_memory is not None:
+        writer.stats('conversations', conversation_memory.stats())
+    for phase, seconds in startup_timings.phases.items():
+        writer.sample('startup_phase_seconds', seconds, help_text='Seconds from process start to each startup phase', phase=phase)
+    writer.stats('deletions', deletion_scheduler.stats())
+    writer.process()
+    return writer.text()
+
+# Run the Discord client; on failure reset it so the supervisor can start it again
+async def run_discord():
     print("Starting bot")
-    await bot.start(TOKEN)
-
-def run_bot():
-    print("Running bot")
-    asyncio.run(start_bot())
-
-def run_flask():
-    # Your Flask app code here
-    pass
-
-def main():
-    print("Starting threads")
-    bot_thread = threading.Thread(target=run_bot)
-    flask_thread = threading.Thread(target=run_flask)
-
-    bot_thread.start()
-    flask_thread.start()
-
-    # Join the threads to ensure they run concurrently
-    bot_thread.join()
-    flask_thread.join()
-
-# Schedule the main function to run every hour
-schedule.every().hour.do(main)
-
-# Start the scheduler in a separate thread
-def run_scheduler():
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
-
-scheduler_thread = threading.Thread(target=run_scheduler)
-scheduler_thread.start()
-
-# Run the main function initially
-main()
+    try:
+        await bot.start(TOKEN)
+    finally:
+        update_tasks.cancel()
+        if not bot.is_closed():
+            await bot.close()
+        bot.clear()
+
+async def shutdown():
+    blocking_executor.shutdown()
+
+# One event loop hosts the Discord client and the health server
+async def main():
+    supervisor = Supervisor()
+    supervisor.add('discord', run_discord)
+    health_server = HealthServer(port=int(os.getenv('HEALTH_PORT', '8000')), ready=readiness, metrics=collect_metrics)
+    supervisor.add('health', health_server.run)
+    supervisor.on_shutdown(shutdown)
+    await supervisor.run()
+
+startup_timings.mark('module_loaded')
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,63 +1,42 @@
 import discord
 from discord.ext import tasks
-from datetime import datetime, timezone
 import os
 import asyncio
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from dotenv import load_dotenv
-from cryptography.fernet import Fernet
+
+from blocking_executor import BlockingCallExecutor
+from google_client import GoogleTasksClientProvider
+from governor import DiscordGovernor, RequestGovernor
+from overview_refresher import OverviewRegistry, PinnedOverviewPublisher
+from overview_renderer import OverviewRenderer
+from tasklist_index import TasklistIndex
+from task_snapshot import SnapshotCache
+from task_store import TaskStore
+from task_sync import TaskSyncEngine
 
 print("main2.py executed")
 
 load_dotenv()
-# German months dictionary
-german_months = {
-    1: "Januar", 2: "Februar", 3: "März", 4: "April", 5: "Mai", 6: "Juni",
-    7: "Juli", 8: "August", 9: "September", 10: "Oktober", 11: "November", 12: "Dezember"
-}
 encryption_key = os.environ.get('ENCRYPTION_KEY').encode()
+google_governor = RequestGovernor(rate=float(os.getenv('GOOGLE_RATE_LIMIT', '5')))
+client_provider = GoogleTasksClientProvider("service_account.json.encrypted", encryption_key, governor=google_governor)
+task_store = TaskStore(os.getenv('TASK_STORE', 'tasks.sqlite'))
+tasklist_index = TasklistIndex(ttl=300, store=task_store)
+sync_engine = TaskSyncEngine(full_resync_interval=900, store=task_store, service_provider=client_provider.get_service)
 
-# Decrypt token.pickle
-def decrypt_token():
-    with open("service_account.json.encrypted", "rb") as encrypted_file:
-        encrypted_data = encrypted_file.read()
-
-    fernet = Fernet(encryption_key)
-    decrypted_data = fernet.decrypt(encrypted_data)
-
-    with open("service_account.json", "wb") as decrypted_file:
-        decrypted_file.write(decrypted_data)
-        print("Decrypted token saved to service_account.json")
-
-decrypt_token()
-
-# Google Tasks API Authentication
+# Google Tasks API Authentication (decrypted in memory and cached per process)
 def authenticate_google_tasks():
-    service_account_file = 'service_account.json'
-    if not os.path.exists(service_account_file):
-        raise Exception(f"Service account file {service_account_file} not found.")
-    creds = service_account.Credentials.from_service_account_file(service_account_file)
-    return build('tasks', 'v1', credentials=creds)
+    return client_provider.get_service()
 
-# Get Tasklist ID by Name
+# Get Tasklist ID by Name (served from the cached index)
 def get_tasklist_id_by_name(service, tasklist_name):
-    result = service.tasklists().list().execute()
-    tasklists = result.get('items', [])
-    for tasklist in tasklists:
-        if tasklist['title'].lower() == tasklist_name.lower():
-            return tasklist['id']
-    raise ValueError(f"Tasklist with name '{tasklist_name}' not found.")
+    return tasklist_index.get_id(service, tasklist_name)
 
 # Discord Bot Token
 token = os.getenv('DISCORD_TOKEN')
 
-# Instantiate the Google Tasks service
-service = authenticate_google_tasks()
-
-# Get the Tasklist ID from its name
+# Name of the tasklist shown in the 'tasks' channel
 tasklist_name = "My Tasks"
-tasklist_id = get_tasklist_id_by_name(service, tasklist_name)
 
 # Discord Bot Initialization
 intents = discord.Intents.default()
@@ -66,109 +45,58 @@ intents.guilds = True
 intents.message_content = True
 bot = discord.Client(intents=intents)
 
-pinned_message_id = None  # Store the pinned message ID to update it
+overview_publisher = PinnedOverviewPublisher(governor=DiscordGovernor())
 
-# Function to get tasks from Google Tasks API
+# Bounded worker pool for the blocking Google API calls
+blocking_executor = BlockingCallExecutor({'google': int(os.getenv('GOOGLE_CONCURRENCY', '4'))})
+
+# Function to get tasks from Google Tasks API (incrementally synced)
 def get_tasks(service, tasklist_id):
-    result = service.tasks().list(tasklist=tasklist_id).execute()
-    tasks = result.get('items', [])
-    return tasks
-
-# Function to get pending tasks
-def get_pending_tasks(service, tasklist_id):
-    tasks = get_tasks(service, tasklist_id)
-    pending_tasks = []
-    now = datetime.now(timezone.utc)
-
-    for task in tasks:
-        due_date = task.get('due')
-        if task.get('status') != 'completed':
-            if due_date:
-                due_datetime = datetime.fromisoformat(due_date[:-1] + '+00:00')
-                if due_datetime > now:
-                    pending_tasks.append({
-                        'title': task['title'],
-                        'due_date': due_datetime.strftime('%Y-%m-%d')
-                    })
-            else:
-                pending_tasks.append({
-                    'title': task['title'],
-                    'due_date': 'No due date'
-                })
-
-    return pending_tasks
-
-# Function to get passed tasks
-def get_passed_tasks(service, tasklist_id):
-    tasks = get_tasks(service, tasklist_id)
-    passed_tasks = []
-    now = datetime.now(timezone.utc)
-
-    for task in tasks:
-        due_date = task.get('due')
-        if task.get('status') != 'completed':
-            if due_date:
-                due_datetime = datetime.fromisoformat(due_date[:-1] + '+00:00')
-                if due_datetime < now:
-                    passed_tasks.append({
-                        'title': task['title'],
-                        'due_date': due_datetime.strftime('%Y-%m-%d')
-                    })
-
-    return passed_tasks
-
-# Function to display tasks overview
+    return sync_engine.sync(service, tasklist_id)
+
+snapshot_cache = SnapshotCache(get_tasks, max_age=5)
+
+# Serve the tasklists saved by the previous run until they have been synced again
+def load_local_tasks():
+    for tasklist in task_store.tasklists():
+        if sync_engine.load_local(tasklist['id']):
+            snapshot_cache.replace(tasklist['id'], sync_engine.tasks(tasklist['id']))
+
+overview_renderer = OverviewRenderer()
+
+# Render the pinned overview of a tasklist as a list of message pages
 def display_tasks(service, tasklist_id):
-    pending_tasks = get_pending_tasks(service, tasklist_id)
-    passed_tasks = get_passed_tasks(service, tasklist_id)
+    return overview_renderer.render(snapshot_cache.get(service, tasklist_id))
 
-    def format_date(date_str):
-        date_obj = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-        return f"{date_obj.day}. {german_months[date_obj.month]}"
+# Render the overview of a tasklist on the Google worker pool
+async def render_overview(tasklist_id):
+    return await blocking_executor.run('google', lambda: display_tasks(authenticate_google_tasks(), tasklist_id))
 
-    pending_tasks_md = '\n'.join([f"- **{task['title']}** (Fällig: {format_date(task['due_date'])})" for task in pending_tasks])
-    passed_tasks_md = '\n'.join([f"- __{task['title']}__ (War fällig: {format_date(task['due_date'])})" for task in passed_tasks])
+# Resolve a tasklist name to its ID, from the local store if it is known there
+async def resolve_tasklist(name):
+    tasklist_id = task_store.tasklist_id(name)
+    if tasklist_id is not None:
+        return tasklist_id
+    return await blocking_executor.run('google', lambda: get_tasklist_id_by_name(authenticate_google_tasks(), name))
 
-    message = (
-        "### Aufgabenübersicht\n"
-        f"**Ausstehende Aufgaben:**\n{pending_tasks_md if pending_tasks_md else 'Keine ausstehenden Aufgaben.'}\n\n"
-        f"**Vergangene Aufgaben:**\n{passed_tasks_md if passed_tasks_md else 'Keine vergangenen Aufgaben.'}\n\n"
-    )
-    
-    return message
+overview_registry = OverviewRegistry(bot, overview_publisher, render_overview, resolve_tasklist, store=task_store)
+overview_registry.add('tasks', tasklist_name)
 
 # Task loop to update tasks overview
 @tasks.loop(seconds=10)
 async def update_tasks():
-    global pinned_message_id
-    for guild in bot.guilds:
-        for channel in guild.text_channels:
-            if channel.name == 'tasks':
-                # Fetch the current pinned message
-                if pinned_message_id is None:
-                    async for msg in channel.history(limit=10):
-                        if msg.pinned and msg.author == bot.user and msg.content.startswith('### Aufgabenübersicht'):
-                            pinned_message_id = msg.id
-                            break
-
-                # Get the latest tasks overview
-                tasks_overview = display_tasks(service, tasklist_id)
-
-                # If we have a pinned message, update it
-                if pinned_message_id:
-                    pinned_message = await channel.fetch_message(pinned_message_id)
-                    await pinned_message.edit(content=tasks_overview)
-                else:
-                    # If no pinned message exists, create a new one
-                    bot_message = await channel.send(tasks_overview)
-                    await bot_message.pin()
-                    pinned_message_id = bot_message.id
+    await overview_registry.refresh_all()
 
 # Event to handle bot readiness
 @bot.event
 async def on_ready():
     print(f'Logged in as {bot.user}')
-    update_tasks.start()  # Start updating tasks every 10 seconds
+    try:
+        await blocking_executor.run('google', load_local_tasks)
+        await overview_registry.resolve()  # Unresolved bindings are retried by refresh_all
+    finally:
+        if not update_tasks.is_running():
+            update_tasks.start()  # Start updating tasks every 10 seconds
 
 # Run the bot
 async def start_bot():
@@ -0,0 +1,76 @@
+import math
+
+import psutil
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items())) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+class MetricsWriter:
+    """Builds a Prometheus text exposition, one sample at a time.
+
+    Samples are grouped per metric family in the output, so a family may be
+    written from several places (e.g. once per channel).
+    """
+
+    def __init__(self, prefix='gtasks_bot_'):
+        self.prefix = prefix
+        self._families = {}
+
+    # Lines of the metric family `name`, starting with its HELP/TYPE header
+    def _declare(self, name, kind, help_text):
+        if name not in self._families:
+            header = [f'# HELP {name} {help_text}'] if help_text else []
+            self._families[name] = header + [f'# TYPE {name} {kind}']
+        return self._families[name]
+
+    def sample(self, name, value, kind='gauge', help_text='', **labels):
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return
+        name = self.prefix + name
+        self._declare(name, kind, help_text).append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+    # Write a histogram from per-bucket (non-cumulative) counts keyed by upper bound
+    def histogram(self, name, buckets, total, help_text='', **labels):
+        name = self.prefix + name
+        lines = self._declare(name, 'histogram', help_text)
+        cumulative = 0
+        for bound, count in sorted(buckets.items()):
+            cumulative += count
+            le = '+Inf' if bound == math.inf else repr(float(bound))
+            lines.append(f'{name}_bucket{_format_labels(dict(labels, le=le))} {cumulative}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+        lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+    # Write the numeric entries of a component's stats() dict as gauges
+    def stats(self, name, stats, **labels):
+        for key, value in stats.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                self.sample(f'{name}_{key}', value, **labels)
+
+    # Resident memory, threads and CPU time of this process
+    def process(self):
+        process = psutil.Process()
+        with process.oneshot():
+            self.sample('process_resident_memory_bytes', process.memory_info().rss, help_text='Resident set size')
+            self.sample('process_threads', process.num_threads(), help_text='OS threads')
+            cpu = process.cpu_times()
+            self.sample('process_cpu_seconds_total', cpu.user + cpu.system, kind='counter', help_text='User and system CPU time')
+
+    def text(self):
+        return '\n'.join(line for lines in self._families.values() for line in lines) + '\n'
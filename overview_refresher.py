@@ -0,0 +1,305 @@
+import asyncio
+import hashlib
+import time
+
+import discord
+
+from governor import DiscordGovernor
+
+
+# Hash of a rendered overview, used to detect no-op edits
+def content_digest(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class PinnedOverviewPublisher:
+    """Writes rendered overviews to pinned messages, skipping unchanged ones.
+
+    The hash of the last content sent to each pinned message is kept, so an
+    identical overview costs no Discord request at all. Edits go through a
+    partial message, which avoids fetching the message first. All Discord
+    calls are paced per channel by the `governor`.
+    """
+
+    def __init__(self, governor=None):
+        self.governor = governor or DiscordGovernor()
+        self._digests = {}
+        self.edits_sent = 0
+        self.edits_skipped = 0
+        self.messages_created = 0
+        self.messages_deleted = 0
+
+    # Record the content a pinned message already shows (e.g. found in history)
+    def remember(self, message_id, content):
+        self._digests[message_id] = content_digest(content)
+
+    # Record the digest of a pinned message's content (e.g. saved by a previous run)
+    def remember_digest(self, message_id, digest):
+        if digest is not None:
+            self._digests[message_id] = digest
+
+    def digest(self, message_id):
+        return self._digests.get(message_id)
+
+    # Show `content` in the pinned message and return its ID, creating and
+    # pinning a new message when there is none (or it was deleted)
+    async def publish(self, channel, message_id, content):
+        digest = content_digest(content)
+        if message_id is not None:
+            if self._digests.get(message_id) == digest:
+                self.edits_skipped += 1
+                return message_id
+            try:
+                print(f"Updating pinned message ID: {message_id}")
+                await self.governor.call(('edit', channel.id), channel.get_partial_message(message_id).edit, content=content)
+                self._digests[message_id] = digest
+                self.edits_sent += 1
+                return message_id
+            except discord.NotFound:
+                print(f"Pinned message {message_id} no longer exists")
+                self._digests.pop(message_id, None)
+
+        print("Creating new pinned message")
+        bot_message = await self.governor.call(('send', channel.id), channel.send, content, idempotent=False)
+        await self.governor.call(('pin', channel.id), bot_message.pin)
+        self._digests[bot_message.id] = digest
+        self.messages_created += 1
+        return bot_message.id
+
+    # Show `pages` in the pinned messages `message_ids` (in order), creating
+    # missing pages and deleting surplus ones; returns the new message IDs
+    async def publish_pages(self, channel, message_ids, pages):
+        published = []
+        for index, content in enumerate(pages):
+            message_id = message_ids[index] if index < len(message_ids) else None
+            published.append(await self.publish(channel, message_id, content))
+        for message_id in message_ids[len(pages):]:
+            print(f"Deleting surplus overview page {message_id}")
+            self._digests.pop(message_id, None)
+            try:
+                await self.governor.call(('delete', channel.id), channel.get_partial_message(message_id).delete)
+                self.messages_deleted += 1
+            except discord.NotFound:
+                pass
+        return published
+
+    def stats(self):
+        return {
+            'edits_sent': self.edits_sent,
+            'edits_skipped': self.edits_skipped,
+            'messages_created': self.messages_created,
+            'messages_deleted': self.messages_deleted,
+        }
+
+
+class OverviewTarget:
+    """A resolved binding: one Discord channel showing one tasklist."""
+
+    def __init__(self, channel_id, tasklist_title, tasklist_id, interval):
+        self.channel_id = channel_id
+        self.tasklist_title = tasklist_title
+        self.tasklist_id = tasklist_id
+        self.pinned_message_ids = None
+        self.digest = None
+        self.interval = interval
+        self.next_refresh = 0.0
+        self.requests = 0  # Refresh requests so far, to spot those made during a refresh
+        self.requested_due = 0.0
+        self.last_success = None
+        self.last_error = None
+
+
+class OverviewRegistry:
+    """Maps (guild, channel) names to tasklists and refreshes their overviews.
+
+    `render(tasklist_id)` returns the overview as one message or as a list of
+    pages. Bindings are resolved into channel and tasklist IDs once (on ready), and
+    due targets are refreshed concurrently, each with its own timeout, so one
+    slow tasklist cannot hold up the others.
+
+    Each target is polled on its own interval, which starts at `min_interval`,
+    doubles after every refresh that found nothing new (up to `max_interval`)
+    and drops back after a change. Writes made by the bot call
+    `request_refresh`, which re-renders the tasklist's overviews within
+    `debounce` seconds.
+
+    With a `store`, the pinned message IDs and their digests are saved after
+    every change, so a restarted bot edits its pins without searching for
+    them first.
+    """
+
+    def __init__(self, client, publisher, render, resolve_tasklist, timeout=30,
+                 min_interval=10, max_interval=300, debounce=0.5, store=None):
+        self.client = client
+        self.publisher = publisher
+        self.render = render
+        self.resolve_tasklist = resolve_tasklist
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.debounce = debounce
+        self.store = store
+        self.next_resolve = None  # When to retry bindings that could not be resolved
+        self.bindings = []
+        self.targets = {}
+        self._loop = None
+        self._wakeup = asyncio.Event()
+        self.refreshes = 0
+        self.failures = 0
+        self.triggered = 0
+        self.unchanged = 0
+
+    # Show the tasklist titled `tasklist_title` in every channel named
+    # `channel_name` (only in `guild_name` if given)
+    def add(self, channel_name, tasklist_title, guild_name=None):
+        self.bindings.append((guild_name, channel_name, tasklist_title))
+
+    # Resolve the bindings into channel and tasklist IDs, keeping known pins.
+    # Bindings that fail for a transient reason (Google unavailable, circuit
+    # open, timeout) keep their old target and are retried by refresh_due.
+    async def resolve(self):
+        targets = {}
+        unresolved = 0
+        for guild in self.client.guilds:
+            for channel in guild.text_channels:
+                for guild_name, channel_name, tasklist_title in self.bindings:
+                    if channel.name != channel_name or guild_name not in (None, guild.name):
+                        continue
+                    target = self.targets.get(channel.id)
+                    try:
+                        tasklist_id = await asyncio.wait_for(self.resolve_tasklist(tasklist_title), timeout=self.timeout)
+                    except ValueError as e:
+                        print(f"Skipping channel {channel.name}: {e}")
+                        continue
+                    except Exception as e:
+                        print(f"Resolving tasklist {tasklist_title} for channel {channel.name} failed: {e!r}, retrying later")
+                        unresolved += 1
+                        if target is not None:
+                            targets[channel.id] = target
+                        continue
+                    if target is None or target.tasklist_id != tasklist_id:
+                        target = OverviewTarget(channel.id, tasklist_title, tasklist_id, self.min_interval)
+                    targets[channel.id] = target
+        self.targets = targets
+        self.next_resolve = time.monotonic() + self.min_interval if unresolved else None
+        print(f"Resolved {len(targets)} overview channels ({unresolved} to retry)")
+
+    # The bot's pinned overview pages in the channel, oldest (first page) first
+    async def _find_pinned_messages(self, channel):
+        message_ids = []
+        async for msg in channel.pins(limit=50, oldest_first=True):
+            if msg.author == self.client.user and msg.content.startswith('### Aufgabenübersicht'):
+                self.publisher.remember(msg.id, msg.content)
+                message_ids.append(msg.id)
+        print(f"Found {len(message_ids)} pinned overview messages in {channel.name}")
+        return message_ids
+
+    async def _refresh(self, target):
+        channel = self.client.get_channel(target.channel_id)
+        if channel is None:
+            raise RuntimeError(f"Channel {target.channel_id} is not available")
+        if target.pinned_message_ids is None and self.store is not None:
+            saved = self.store.pinned_messages(channel.id)
+            if saved:
+                for message_id, digest in saved:
+                    self.publisher.remember_digest(message_id, digest)
+                target.pinned_message_ids = [message_id for message_id, _ in saved]
+        if target.pinned_message_ids is None:
+            print(f"No pinned message IDs for {channel.name}, searching for pinned messages")
+            target.pinned_message_ids = await self._find_pinned_messages(channel)
+        pages = await self.render(target.tasklist_id)
+        if isinstance(pages, str):
+            pages = [pages]
+        message_ids = await self.publisher.publish_pages(channel, target.pinned_message_ids, pages)
+        digest = content_digest('\x00'.join(pages))
+        changed = digest != target.digest
+        if self.store is not None and (changed or message_ids != target.pinned_message_ids):
+            self.store.save_pinned_messages(channel.id, [(message_id, self.publisher.digest(message_id))
+                                                         for message_id in message_ids])
+        target.pinned_message_ids = message_ids
+        target.digest = digest
+        return changed
+
+    async def _refresh_with_timeout(self, target):
+        requests = target.requests
+        try:
+            changed = await asyncio.wait_for(self._refresh(target), timeout=self.timeout)
+            target.last_success = time.monotonic()
+            target.last_error = None
+            # Poll busy lists often and idle ones less and less
+            if changed:
+                target.interval = self.min_interval
+            else:
+                target.interval = min(target.interval * 2, self.max_interval)
+                self.unchanged += 1
+            target.next_refresh = time.monotonic() + target.interval
+        except Exception as e:
+            target.last_error = e
+            target.next_refresh = time.monotonic() + self.min_interval
+            self.failures += 1
+            print(f"Refreshing overview for {target.tasklist_title} in channel {target.channel_id} failed: {e!r}")
+        # A request made while this refresh ran may not be rendered yet: keep its deadline
+        if target.requests != requests:
+            target.interval = self.min_interval
+            target.next_refresh = min(target.next_refresh, target.requested_due)
+
+    async def _retry_resolve(self):
+        if self.next_resolve is not None and self.next_resolve <= time.monotonic():
+            await self.resolve()
+
+    # Refresh every overview concurrently
+    async def refresh_all(self):
+        await self._retry_resolve()
+        await asyncio.gather(*(self._refresh_with_timeout(target) for target in list(self.targets.values())))
+        self.refreshes += 1
+
+    # Wait until an overview is due (or a refresh is requested) and refresh
+    # the due ones; returns how many were refreshed
+    async def refresh_due(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup.clear()
+        await self._retry_resolve()
+        now = time.monotonic()
+        targets = list(self.targets.values())
+        due = [target for target in targets if target.next_refresh <= now]
+        if not due:
+            next_refresh = min([target.next_refresh for target in targets]
+                               + ([self.next_resolve] if self.next_resolve is not None else []),
+                               default=now + self.max_interval)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, next_refresh - now))
+            except asyncio.TimeoutError:
+                pass
+            return 0
+        await asyncio.gather(*(self._refresh_with_timeout(target) for target in due))
+        self.refreshes += 1
+        return len(due)
+
+    def _schedule_refresh(self, tasklist_id):
+        due = time.monotonic() + self.debounce
+        for target in self.targets.values():
+            if target.tasklist_id == tasklist_id:
+                target.interval = self.min_interval
+                target.next_refresh = min(target.next_refresh, due)
+                target.requests += 1
+                target.requested_due = due
+        self.triggered += 1
+        self._wakeup.set()
+
+    # Re-render the overviews of a tasklist soon; safe to call from any thread
+    def request_refresh(self, tasklist_id):
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._schedule_refresh, tasklist_id)
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'targets': len(self.targets),
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'triggered': self.triggered,
+            'unchanged': self.unchanged,
+            'max_interval_seconds': max((target.interval for target in self.targets.values()), default=0),
+            'next_refresh_seconds': max(0.0, min((target.next_refresh for target in self.targets.values()), default=now) - now),
+        }
@@ -0,0 +1,102 @@
+GERMAN_MONTHS = {
+    1: "Januar", 2: "Februar", 3: "März", 4: "April", 5: "Mai", 6: "Juni",
+    7: "Juli", 8: "August", 9: "September", 10: "Oktober", 11: "November", 12: "Dezember"
+}
+
+# Discord rejects messages longer than this
+MESSAGE_LIMIT = 2000
+
+OVERVIEW_HEADER = "### Aufgabenübersicht"
+PENDING_HEADER = "**Ausstehende Aufgaben:**"
+PASSED_HEADER = "**Vergangene Aufgaben:**"
+NO_PENDING = "Keine ausstehenden Aufgaben."
+NO_PASSED = "Keine vergangenen Aufgaben."
+
+
+def format_german_date(value):
+    return f"{value.day}. {GERMAN_MONTHS[value.month]}"
+
+
+class OverviewRenderer:
+    """Renders a TaskSnapshot into one or more pinned-message pages.
+
+    Each task's line is rendered once and reused while the task's `updated`
+    timestamp stays the same. The overview is split into pages of at most
+    `limit` characters; every page starts with the overview header (so the
+    pins can be found again, numbered when there are several pages), and a
+    section that continues on the next page repeats its heading.
+    """
+
+    def __init__(self, limit=MESSAGE_LIMIT):
+        self.limit = limit
+        self._lines = {}
+        self.lines_rendered = 0
+        self.lines_reused = 0
+
+    def _line(self, cache, used, task, section):
+        key = (task['id'], task['updated'], section)
+        line = cache.get(key)
+        if line is None:
+            if section == 'passed':
+                line = f"- __{task['title']}__ (War fällig: {format_german_date(task['due'])})"
+            elif task['due'] is not None:
+                line = f"- **{task['title']}** (Fällig: {format_german_date(task['due'])})"
+            else:
+                line = f"- **{task['title']}**"
+            # A single line must still fit on a page below the headers
+            max_length = self._budget() - len(OVERVIEW_HEADER) - len(PENDING_HEADER) - 2
+            if len(line) > max_length:
+                line = line[:max_length - 1] + "…"
+            self.lines_rendered += 1
+        else:
+            self.lines_reused += 1
+        used[key] = line
+        return line
+
+    # Room left on a page after the page number suffix, e.g. " (12/12)"
+    def _budget(self):
+        return self.limit - 8
+
+    # Return the overview of the snapshot as a list of message contents
+    def render(self, snapshot):
+        cache = self._lines.get(snapshot.tasklist_id, {})
+        used = {}
+        pending = [self._line(cache, used, task, 'pending') for task in snapshot.pending + snapshot.no_due]
+        passed = [self._line(cache, used, task, 'passed') for task in snapshot.passed]
+        # Keep only the lines of tasks that still exist in their current version
+        self._lines[snapshot.tasklist_id] = used
+
+        sections = [(PENDING_HEADER, pending or [NO_PENDING]), (PASSED_HEADER, passed or [NO_PASSED])]
+        pages = []
+        page = [OVERVIEW_HEADER]
+        length = len(OVERVIEW_HEADER)
+        for heading, lines in sections:
+            if len(page) > 1:
+                page.append('')
+                length += 1
+            page.append(heading)
+            length += len(heading) + 1
+            for line in lines:
+                if length + len(line) + 1 > self._budget():
+                    # Do not leave a heading without lines at the bottom of a page
+                    if page[-1] == heading:
+                        page.pop()
+                        if page[-1] == '':
+                            page.pop()
+                    pages.append('\n'.join(page))
+                    page = [OVERVIEW_HEADER, heading]
+                    length = len(OVERVIEW_HEADER) + len(heading) + 1
+                page.append(line)
+                length += len(line) + 1
+        pages.append('\n'.join(page))
+        if len(pages) > 1:
+            pages = [f"{OVERVIEW_HEADER} ({index}/{len(pages)})" + content[len(OVERVIEW_HEADER):]
+                     for index, content in enumerate(pages, 1)]
+        return pages
+
+    def stats(self):
+        return {
+            'lines_cached': sum(len(lines) for lines in self._lines.values()),
+            'lines_rendered': self.lines_rendered,
+            'lines_reused': self.lines_reused,
+        }
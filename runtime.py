@@ -0,0 +1,98 @@
+import asyncio
+import signal
+import time
+
+import psutil
+
+
+class StartupTimings:
+    """Seconds from process start to each startup phase, recorded once each."""
+
+    def __init__(self):
+        self.process_started = psutil.Process().create_time()
+        self.phases = {}
+
+    def mark(self, phase):
+        if phase not in self.phases:
+            self.phases[phase] = time.time() - self.process_started
+            print(f"Startup: {phase} after {self.phases[phase]:.2f}s")
+
+
+class Supervisor:
+    """Runs the bot's long-lived components as tasks on one event loop.
+
+    A component is an async callable that runs until it fails. Failed (or
+    unexpectedly finished) components are restarted with exponential backoff,
+    which resets once a component has stayed up for `stable_after` seconds.
+    SIGTERM and SIGINT cancel every component and run the shutdown callbacks.
+    """
+
+    def __init__(self, min_backoff=1, max_backoff=300, stable_after=60):
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self._components = {}
+        self._shutdown_callbacks = []
+        self._stopping = None
+        self.restarts = {}
+
+    # Register a component under `name`
+    def add(self, name, component):
+        self._components[name] = component
+        self.restarts[name] = 0
+
+    # Register an async callback to run after the components were cancelled
+    def on_shutdown(self, callback):
+        self._shutdown_callbacks.append(callback)
+
+    def stop(self):
+        if self._stopping is not None and not self._stopping.is_set():
+            print("Shutdown requested")
+            self._stopping.set()
+
+    async def _supervise(self, name, component):
+        backoff = self.min_backoff
+        while True:
+            started = time.monotonic()
+            try:
+                print(f"Starting {name}")
+                await component()
+                print(f"{name} exited")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"{name} crashed: {e!r}")
+            if time.monotonic() - started >= self.stable_after:
+                backoff = self.min_backoff
+            self.restarts[name] += 1
+            print(f"Restarting {name} in {backoff}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    # Run every component until SIGTERM/SIGINT or stop()
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # Not supported on this platform; Ctrl+C still interrupts asyncio.run
+
+        tasks = [asyncio.create_task(self._supervise(name, component), name=name)
+                 for name, component in self._components.items()]
+        try:
+            await self._stopping.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for callback in self._shutdown_callbacks:
+                try:
+                    await callback()
+                except Exception as e:
+                    print(f"Shutdown callback failed: {e!r}")
+            print("Shutdown complete")
+
+    def stats(self):
+        return {'components': list(self._components), 'restarts': dict(self.restarts)}
@@ -0,0 +1,149 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import dateutil.parser
+import discord
+
+from fast_path import SUBJECTS
+from overview_renderer import MESSAGE_LIMIT, format_german_date
+from task_sync import format_rfc3339, iter_tasks
+
+# /task-history shows 10 tasks by default and never fetches more than this
+DEFAULT_HISTORY_LIMIT = 10
+MAX_HISTORY_LIMIT = 50
+
+
+# Parse "/task-history [N] [subject]" into (limit, subject); subject aliases
+# are mapped to the name used in task titles
+def parse_history_command(content):
+    limit = DEFAULT_HISTORY_LIMIT
+    words = []
+    for word in content.split()[1:]:
+        if word.isdigit():
+            limit = max(1, min(int(word), MAX_HISTORY_LIMIT))
+        else:
+            words.append(word)
+    subject = ' '.join(words) or None
+    if subject is not None:
+        subject = SUBJECTS.get(subject.lower(), subject)
+    return limit, subject
+
+
+class CompletedTaskIndex:
+    """Keeps the completed tasks of tasklists in the store, ordered by completion.
+
+    Completed and hidden tasks are fetched with `completedMin`/`completedMax`
+    windows: the first refresh of a tasklist walks back `history_days` in
+    windows of `window_days`, later ones only ask for tasks completed since the
+    previous refresh. Queries are answered from the store's completion index.
+    """
+
+    def __init__(self, store, history_days=90, window_days=30, clock_skew=60):
+        self.store = store
+        self.history_days = history_days
+        self.window_days = window_days
+        self.clock_skew = clock_skew
+        self._lock = threading.Lock()
+        self._watermarks = {}
+        self.refreshes = 0
+        self.windows_fetched = 0
+        self.tasks_fetched = 0
+
+    def _fetch_window(self, service, tasklist_id, completed_min, completed_max=None):
+        params = {'showCompleted': True, 'showHidden': True, 'completedMin': format_rfc3339(completed_min)}
+        if completed_max is not None:
+            params['completedMax'] = format_rfc3339(completed_max)
+        tasks = list(iter_tasks(service, tasklist_id, **params))
+        if tasks:
+            self.store.upsert_tasks(tasklist_id, tasks)
+        with self._lock:
+            self.windows_fetched += 1
+            self.tasks_fetched += len(tasks)
+
+    # Fetch the tasks completed since the last refresh of the tasklist
+    def refresh(self, service, tasklist_id):
+        started_at = datetime.now(timezone.utc)
+        with self._lock:
+            watermark = self._watermarks.get(tasklist_id)
+        if watermark is None:
+            window_end = None
+            window_start = started_at - timedelta(days=self.window_days)
+            oldest = started_at - timedelta(days=self.history_days)
+            while window_end is None or window_end > oldest:
+                self._fetch_window(service, tasklist_id, max(window_start, oldest), window_end)
+                window_end = window_start
+                window_start -= timedelta(days=self.window_days)
+        else:
+            self._fetch_window(service, tasklist_id, watermark - timedelta(seconds=self.clock_skew))
+        with self._lock:
+            self._watermarks[tasklist_id] = started_at
+            self.refreshes += 1
+
+    # The last `limit` completed tasks, newest first, optionally of one subject
+    def query(self, tasklist_id, limit=DEFAULT_HISTORY_LIMIT, subject=None):
+        return self.store.completed_tasks(tasklist_id, limit=limit, subject=subject)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'refreshes': self.refreshes,
+                'windows_fetched': self.windows_fetched,
+                'tasks_fetched': self.tasks_fetched,
+            }
+
+
+def _history_line(task):
+    if task.get('completed'):
+        completed = dateutil.parser.isoparse(task['completed'])
+        return f"- {task['title']} (erledigt am {format_german_date(completed)})"
+    return f"- {task['title']}"
+
+
+class TaskHistoryView(discord.ui.View):
+    """Pages through completed tasks that were queried once.
+
+    Turning a page only edits the message with another slice of `tasks`, so
+    it costs no Google or database request.
+    """
+
+    def __init__(self, tasks, subject=None, page_size=10, timeout=120):
+        super().__init__(timeout=timeout)
+        self.tasks = tasks
+        self.subject = subject
+        self.page_size = page_size
+        self.page = 0
+        self._update_buttons()
+
+    @property
+    def page_count(self):
+        return max(1, -(-len(self.tasks) // self.page_size))
+
+    def content(self):
+        header = f"### Last {len(self.tasks)} Completed Tasks"
+        if self.subject:
+            header += f" ({self.subject})"
+        if self.page_count > 1:
+            header += f" – Seite {self.page + 1}/{self.page_count}"
+        start = self.page * self.page_size
+        lines = [_history_line(task) for task in self.tasks[start:start + self.page_size]]
+        content = '\n'.join([header] + (lines or ["Keine erledigten Aufgaben."]))
+        return content[:MESSAGE_LIMIT]
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+        if self.page_count == 1:
+            self.clear_items()
+
+    async def _show(self, interaction, page):
+        self.page = max(0, min(page, self.page_count - 1))
+        self._update_buttons()
+        await interaction.response.edit_message(content=self.content(), view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        await self._show(interaction, self.page + 1)
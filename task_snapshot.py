@@ -0,0 +1,200 @@
+import difflib
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime, timezone
+
+
+# Parse a Google Tasks RFC3339 timestamp into a timezone-aware datetime
+def parse_rfc3339(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+# Normalise a title for matching: case-insensitive, accent-free, single spaces
+def fold_title(title):
+    decomposed = unicodedata.normalize('NFKD', title.casefold())
+    return ' '.join(''.join(char for char in decomposed if not unicodedata.combining(char)).split())
+
+
+class TaskSnapshot:
+    """One fetch of a tasklist, parsed once and partitioned in a single pass.
+
+    `pending` and `passed` hold open tasks with a due date in the future and
+    in the past, `no_due` holds open tasks without a due date and `completed`
+    holds completed tasks.
+    """
+
+    def __init__(self, tasklist_id, tasks, now=None):
+        self.tasklist_id = tasklist_id
+        self.now = now or datetime.now(timezone.utc)
+        self.fetched_at = time.monotonic()
+        self.pending = []
+        self.passed = []
+        self.no_due = []
+        self.completed = []
+
+        for task in tasks:
+            record = {
+                'id': task['id'],
+                'title': task.get('title', ''),
+                'due': parse_rfc3339(task.get('due')),
+                'status': task.get('status'),
+                'updated': task.get('updated'),
+                'notes': task.get('notes'),
+            }
+            if record['status'] == 'completed':
+                self.completed.append(record)
+            elif record['due'] is None:
+                self.no_due.append(record)
+            elif record['due'] > self.now:
+                self.pending.append(record)
+            else:
+                self.passed.append(record)
+
+        self._ids = None
+        self._titles = None
+
+        print(f"Snapshot of tasklist {tasklist_id}: {len(self.pending)} pending, "
+              f"{len(self.passed)} passed, {len(self.no_due)} without due date")
+
+    # All tasks that are not completed, in pending, passed, undated order
+    @property
+    def open_tasks(self):
+        return self.pending + self.passed + self.no_due
+
+    def _build_index(self):
+        if self._ids is None:
+            titles = {}
+            for task in self.open_tasks:
+                titles.setdefault(fold_title(task['title']), task)
+            self._titles = titles
+            self._ids = {task['id']: task for task in self.open_tasks}
+
+    # Open task with the given ID, or None
+    def find_by_id(self, task_id):
+        self._build_index()
+        return self._ids.get(task_id)
+
+    # Open task whose title matches, ignoring case and accents and tolerating
+    # typos; a fuzzy match must have the same numbers ("Nr. 5" never matches
+    # "Nr. 3") and be the only close candidate
+    def find_by_title(self, title, cutoff=0.8):
+        self._build_index()
+        folded = fold_title(title)
+        if folded in self._titles:
+            return self._titles[folded]
+        numbers = re.findall(r'\d+', folded)
+        candidates = [other for other in self._titles if re.findall(r'\d+', other) == numbers]
+        matches = difflib.get_close_matches(folded, candidates, n=2, cutoff=cutoff)
+        return self._titles[matches[0]] if len(matches) == 1 else None
+
+    # Open task due on `due_date` (a date, or None for undated tasks) whose
+    # title is at least `cutoff` similar to `title` and has the same numbers
+    # (so "S. 42 Nr. 3" and "S. 42 Nr. 4" stay different tasks), or None
+    def find_duplicate(self, title, due_date, cutoff=0.85):
+        folded = fold_title(title)
+        numbers = re.findall(r'\d+', folded)
+        best, best_ratio = None, cutoff
+        for task in self.open_tasks:
+            if (task['due'].date() if task['due'] else None) != due_date:
+                continue
+            other = fold_title(task['title'])
+            if re.findall(r'\d+', other) != numbers:
+                continue
+            ratio = difflib.SequenceMatcher(None, folded, other).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = task, ratio
+        return best
+
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+
+class SnapshotCache:
+    """Shares one TaskSnapshot per tasklist between the renderer and the tools.
+
+    Snapshots older than `max_age` seconds are refetched; writes made by the
+    bot call `invalidate` so the next read sees them. When a fetch fails (for
+    example while the API circuit breaker is open), the last good snapshot of
+    the tasklist is served instead.
+    """
+
+    def __init__(self, fetch_tasks, max_age=5):
+        self.fetch_tasks = fetch_tasks
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        self._snapshots = {}
+        self._last_good = {}
+        self.hits = 0
+        self.fetches = 0
+        self.stale_served = 0
+
+    def _fetch_lock(self, tasklist_id):
+        with self._lock:
+            return self._fetch_locks.setdefault(tasklist_id, threading.Lock())
+
+    def _fresh(self, tasklist_id):
+        snapshot = self._snapshots.get(tasklist_id)
+        if snapshot is not None and snapshot.age() <= self.max_age:
+            return snapshot
+        return None
+
+    # Return a snapshot of the tasklist, fetching it at most once per max_age
+    def get(self, service, tasklist_id):
+        with self._fetch_lock(tasklist_id):
+            with self._lock:
+                snapshot = self._fresh(tasklist_id)
+                if snapshot is not None:
+                    self.hits += 1
+                    return snapshot
+            try:
+                snapshot = TaskSnapshot(tasklist_id, self.fetch_tasks(service, tasklist_id))
+            except Exception as e:
+                with self._lock:
+                    stale = self._last_good.get(tasklist_id)
+                    if stale is None:
+                        raise
+                    self.stale_served += 1
+                print(f"Fetching tasklist {tasklist_id} failed ({e!r}), serving snapshot from {stale.age():.0f}s ago")
+                return stale
+            with self._lock:
+                self._snapshots[tasklist_id] = snapshot
+                self._last_good[tasklist_id] = snapshot
+                self.fetches += 1
+            return snapshot
+
+    # The current snapshot if it is still fresh, without fetching
+    def peek(self, tasklist_id):
+        with self._lock:
+            snapshot = self._fresh(tasklist_id)
+            if snapshot is not None:
+                self.hits += 1
+            return snapshot
+
+    # Install a snapshot built from tasks already at hand (e.g. after a write)
+    def replace(self, tasklist_id, tasks):
+        snapshot = TaskSnapshot(tasklist_id, tasks)
+        with self._lock:
+            self._snapshots[tasklist_id] = snapshot
+            self._last_good[tasklist_id] = snapshot
+        return snapshot
+
+    def invalidate(self, tasklist_id=None):
+        with self._lock:
+            if tasklist_id is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(tasklist_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'snapshots': len(self._snapshots),
+                'hits': self.hits,
+                'fetches': self.fetches,
+                'stale_served': self.stale_served,
+            }
@@ -0,0 +1,145 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class TaskStore:
+    """On-disk mirror of tasklists, tasks and pinned overview messages.
+
+    The bot writes every sync and every one of its own writes through to a
+    local SQLite database, so after a restart the overviews, task lookups and
+    the task history are served from disk right away while the first Google
+    sync runs in the background.
+    """
+
+    def __init__(self, path='tasks.sqlite'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS tasklists (
+                id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                synced_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS tasks (
+                tasklist_id TEXT NOT NULL,
+                id TEXT NOT NULL,
+                title TEXT,
+                status TEXT,
+                updated TEXT,
+                completed TEXT,
+                data TEXT NOT NULL,
+                PRIMARY KEY (tasklist_id, id)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_by_completion ON tasks (tasklist_id, status, completed);
+            CREATE TABLE IF NOT EXISTS pinned_messages (
+                channel_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                digest TEXT,
+                PRIMARY KEY (channel_id, position)
+            );
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def _row(tasklist_id, task):
+        return (tasklist_id, task['id'], task.get('title', ''), task.get('status'), task.get('updated'),
+                task.get('completed'), json.dumps(task))
+
+    # Replace the known tasklists (title -> ID)
+    def save_tasklists(self, tasklists):
+        with self._lock, self._db:
+            known = {row[0] for row in self._db.execute("SELECT id FROM tasklists")}
+            current = {tasklist['id'] for tasklist in tasklists}
+            self._db.executemany("DELETE FROM tasklists WHERE id = ?", [(gone,) for gone in known - current])
+            self._db.executemany(
+                "INSERT INTO tasklists (id, title) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET title = excluded.title",
+                [(tasklist['id'], tasklist['title']) for tasklist in tasklists],
+            )
+
+    def tasklists(self):
+        with self._lock:
+            return [{'id': row[0], 'title': row[1]} for row in self._db.execute("SELECT id, title FROM tasklists")]
+
+    # ID of the tasklist with this title (case-insensitive), or None
+    def tasklist_id(self, title):
+        for tasklist in self.tasklists():
+            if tasklist['title'].casefold() == title.casefold():
+                return tasklist['id']
+        return None
+
+    # Store the complete contents of a tasklist after a full sync
+    def replace_tasks(self, tasklist_id, tasks):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM tasks WHERE tasklist_id = ?", (tasklist_id,))
+            self._db.executemany("INSERT INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 [self._row(tasklist_id, task) for task in tasks])
+            self._mark_synced(tasklist_id)
+
+    # Apply changed tasks (from a delta sync or a write); deleted ones are removed
+    def upsert_tasks(self, tasklist_id, tasks, synced=False):
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM tasks WHERE tasklist_id = ? AND id = ?",
+                                 [(tasklist_id, task['id']) for task in tasks if task.get('deleted')])
+            self._db.executemany("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 [self._row(tasklist_id, task) for task in tasks if not task.get('deleted')])
+            if synced:
+                self._mark_synced(tasklist_id)
+
+    def _mark_synced(self, tasklist_id):
+        self._db.execute(
+            "INSERT INTO tasklists (id, title, synced_at) VALUES (?, '', ?) "
+            "ON CONFLICT(id) DO UPDATE SET synced_at = excluded.synced_at",
+            (tasklist_id, time.time()),
+        )
+
+    # Every stored task of a tasklist, or None if it was never synced
+    def load_tasks(self, tasklist_id):
+        with self._lock:
+            synced = self._db.execute("SELECT synced_at FROM tasklists WHERE id = ?", (tasklist_id,)).fetchone()
+            if not synced or synced[0] is None:
+                return None
+            return [json.loads(row[0]) for row in self._db.execute(
+                "SELECT data FROM tasks WHERE tasklist_id = ?", (tasklist_id,))]
+
+    # Most recently completed tasks of a tasklist, newest first; with a
+    # `subject`, only those whose title mentions it
+    def completed_tasks(self, tasklist_id, limit=10, subject=None):
+        completed = []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT title, data FROM tasks WHERE tasklist_id = ? AND status = 'completed' "
+                "ORDER BY completed DESC", (tasklist_id,))
+            for title, data in rows:
+                if subject and subject.casefold() not in (title or '').casefold():
+                    continue
+                completed.append(json.loads(data))
+                if len(completed) >= limit:
+                    break
+        return completed
+
+    # Pinned overview pages of a channel as (message_id, digest), in page order
+    def pinned_messages(self, channel_id):
+        with self._lock:
+            return list(self._db.execute(
+                "SELECT message_id, digest FROM pinned_messages WHERE channel_id = ? ORDER BY position", (channel_id,)))
+
+    def save_pinned_messages(self, channel_id, pages):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM pinned_messages WHERE channel_id = ?", (channel_id,))
+            self._db.executemany("INSERT INTO pinned_messages VALUES (?, ?, ?, ?)",
+                                 [(channel_id, position, message_id, digest)
+                                  for position, (message_id, digest) in enumerate(pages)])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tasklists': self._db.execute("SELECT COUNT(*) FROM tasklists").fetchone()[0],
+                'tasks': self._db.execute("SELECT COUNT(*) FROM tasks").fetchone()[0],
+                'pinned_messages': self._db.execute("SELECT COUNT(*) FROM pinned_messages").fetchone()[0],
+            }
@@ -0,0 +1,186 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+# Largest page size tasks().list accepts
+PAGE_SIZE = 100
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='task-prefetch')
+
+
+# Format a datetime the way the Google Tasks API expects in updatedMin
+def format_rfc3339(value):
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+# Yield every task of a tasklist page by page. With `prefetch_service`, a
+# callable returning the calling thread's service, the next page is fetched
+# on a worker thread while the current one is being consumed; the worker
+# never shares `service`, whose httplib2 connection is not thread-safe
+def iter_tasks(service, tasklist_id, prefetch_service=None, page_size=PAGE_SIZE, **params):
+    def fetch(page_token, service=service):
+        return service.tasks().list(tasklist=tasklist_id, maxResults=page_size, pageToken=page_token, **params).execute()
+
+    def prefetch(page_token):
+        return fetch(page_token, prefetch_service())
+
+    result = fetch(None)
+    next_page = None
+    try:
+        while True:
+            page_token = result.get('nextPageToken')
+            next_page = _prefetch_pool.submit(prefetch, page_token) if prefetch_service and page_token else None
+            yield from result.get('items', [])
+            if not page_token:
+                return
+            result = next_page.result() if next_page else fetch(page_token)
+            next_page = None
+    finally:
+        # A consumer that stops early leaves no page fetch behind
+        if next_page is not None:
+            next_page.cancel()
+
+
+class TaskSyncEngine:
+    """Keeps a local copy of each tasklist and fetches only what changed.
+
+    The first sync of a tasklist lists everything; later syncs ask for tasks
+    updated since the previous sync (`updatedMin`, including deleted and
+    hidden ones) and merge them into the local copy. A full resync happens
+    every `full_resync_interval` seconds, after an error, or when a delta
+    references a task the local copy does not know.
+
+    With a `store`, every change is written through to disk, and
+    `load_local` restores a tasklist saved by a previous run; it is served
+    as is until the next sync, which is a full one. With a `service_provider`
+    (returning the calling thread's service), full syncs prefetch the next
+    page on a worker thread.
+    """
+
+    def __init__(self, full_resync_interval=900, clock_skew=60, store=None, service_provider=None):
+        self.full_resync_interval = full_resync_interval
+        self.store = store
+        self.service_provider = service_provider
+        self.clock_skew = timedelta(seconds=clock_skew)
+        self._lock = threading.Lock()
+        self._sync_locks = {}
+        self._stores = {}
+        self._synced_at = {}
+        self._full_synced_at = {}
+        self._needs_full = set()
+        self.full_syncs = 0
+        self.delta_syncs = 0
+        self.delta_items = 0
+
+    def _sync_lock(self, tasklist_id):
+        with self._lock:
+            return self._sync_locks.setdefault(tasklist_id, threading.Lock())
+
+    def _needs_full_sync(self, tasklist_id):
+        if tasklist_id not in self._stores or tasklist_id in self._needs_full:
+            return True
+        return time.monotonic() - self._full_synced_at[tasklist_id] > self.full_resync_interval
+
+    def _full_sync(self, service, tasklist_id, started_at):
+        store = {task['id']: task for task in iter_tasks(
+            service, tasklist_id, prefetch_service=self.service_provider, showCompleted=True, showHidden=True,
+        )}
+        if self.store is not None:
+            self.store.replace_tasks(tasklist_id, list(store.values()))
+        with self._lock:
+            self._stores[tasklist_id] = store
+            self._synced_at[tasklist_id] = started_at
+            self._full_synced_at[tasklist_id] = time.monotonic()
+            self._needs_full.discard(tasklist_id)
+            self.full_syncs += 1
+        print(f"Full sync of tasklist {tasklist_id}: {len(store)} tasks")
+
+    def _delta_sync(self, service, tasklist_id, started_at):
+        updated_min = format_rfc3339(self._synced_at[tasklist_id] - self.clock_skew)
+        items = list(iter_tasks(
+            service, tasklist_id,
+            updatedMin=updated_min, showCompleted=True, showDeleted=True, showHidden=True,
+        ))
+        with self._lock:
+            store = self._stores[tasklist_id]
+            for task in items:
+                if task.get('deleted'):
+                    store.pop(task['id'], None)
+                else:
+                    store[task['id']] = task
+            consistent = all(task.get('deleted') or not task.get('parent') or task['parent'] in store for task in items)
+            if not consistent:
+                self._needs_full.add(tasklist_id)
+            self._synced_at[tasklist_id] = started_at
+            self.delta_syncs += 1
+            self.delta_items += len(items)
+        if self.store is not None:
+            self.store.upsert_tasks(tasklist_id, items, synced=True)
+        if items:
+            print(f"Delta sync of tasklist {tasklist_id}: {len(items)} changed tasks")
+        if not consistent:
+            print(f"Delta for tasklist {tasklist_id} references unknown tasks, scheduling full resync")
+
+    # Bring the local copy of the tasklist up to date and return its tasks
+    def sync(self, service, tasklist_id):
+        with self._sync_lock(tasklist_id):
+            started_at = datetime.now(timezone.utc)
+            try:
+                if self._needs_full_sync(tasklist_id):
+                    self._full_sync(service, tasklist_id, started_at)
+                else:
+                    self._delta_sync(service, tasklist_id, started_at)
+            except Exception:
+                self.mark_inconsistent(tasklist_id)
+                raise
+            return self.tasks(tasklist_id)
+
+    # Merge tasks returned by the bot's own writes into the local copy;
+    # returns False when the tasklist has not been synced yet
+    def apply(self, tasklist_id, tasks):
+        with self._lock:
+            store = self._stores.get(tasklist_id)
+            if store is None:
+                return False
+            for task in tasks:
+                store[task['id']] = task
+        if self.store is not None:
+            self.store.upsert_tasks(tasklist_id, tasks)
+        return True
+
+    # Restore a tasklist from the store if it is not loaded yet; returns
+    # whether local tasks are available
+    def load_local(self, tasklist_id):
+        if self.store is None:
+            return False
+        with self._lock:
+            if tasklist_id in self._stores:
+                return True
+        tasks = self.store.load_tasks(tasklist_id)
+        if tasks is None:
+            return False
+        with self._lock:
+            if tasklist_id not in self._stores:
+                self._stores[tasklist_id] = {task['id']: task for task in tasks}
+                self._needs_full.add(tasklist_id)
+        print(f"Loaded {len(tasks)} stored tasks of tasklist {tasklist_id}")
+        return True
+
+    def tasks(self, tasklist_id):
+        with self._lock:
+            return list(self._stores.get(tasklist_id, {}).values())
+
+    def mark_inconsistent(self, tasklist_id):
+        with self._lock:
+            self._needs_full.add(tasklist_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tasklists': len(self._stores),
+                'tasks': sum(len(store) for store in self._stores.values()),
+                'full_syncs': self.full_syncs,
+                'delta_syncs': self.delta_syncs,
+                'delta_items': self.delta_items,
+            }
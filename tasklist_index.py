@@ -0,0 +1,75 @@
+import threading
+import time
+
+
+class TasklistIndex:
+    """Case-insensitive tasklist title -> ID index with TTL expiry.
+
+    A lookup that misses forces one reload before giving up, so newly created
+    tasklists are picked up without waiting for the TTL. With a `store`, the
+    index starts from the tasklists saved by the previous run.
+    """
+
+    def __init__(self, ttl=300, store=None):
+        self.ttl = ttl
+        self.store = store
+        self._lock = threading.Lock()
+        self._ids_by_title = {}
+        self._loaded_at = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        if store is not None:
+            saved = store.tasklists()
+            if saved:
+                self._ids_by_title = {tasklist['title'].casefold(): tasklist['id'] for tasklist in saved}
+                self._loaded_at = time.monotonic()
+
+    # Fetch every tasklist, following nextPageToken
+    def _load(self, service):
+        ids_by_title = {}
+        tasklists = []
+        page_token = None
+        while True:
+            result = service.tasklists().list(maxResults=100, pageToken=page_token).execute()
+            for tasklist in result.get('items', []):
+                ids_by_title.setdefault(tasklist['title'].casefold(), tasklist['id'])
+                tasklists.append(tasklist)
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                break
+        self._ids_by_title = ids_by_title
+        if self.store is not None:
+            self.store.save_tasklists(tasklists)
+        self._loaded_at = time.monotonic()
+        self.reloads += 1
+        print(f"Indexed {len(ids_by_title)} tasklists")
+
+    def _expired(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    # Resolve a tasklist title to its ID
+    def get_id(self, service, title):
+        key = title.casefold()
+        with self._lock:
+            if not self._expired() and key in self._ids_by_title:
+                self.hits += 1
+                return self._ids_by_title[key]
+            self.misses += 1
+            self._load(service)
+            if key in self._ids_by_title:
+                return self._ids_by_title[key]
+        raise ValueError(f"Tasklist '{title}' not found")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tasklists': len(self._ids_by_title),
+                'hits': self.hits,
+                'misses': self.misses,
+                'reloads': self.reloads,
+            }
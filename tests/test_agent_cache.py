@@ -0,0 +1,21 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agent_cache import created_task_calls
+
+
+def _run(status):
+    args = {'task_title': "Essay schreiben", 'due_date': '2026-10-18'}
+    return [
+        HumanMessage(content="Essay schreiben bis morgen"),
+        AIMessage(content='', tool_calls=[{'name': 'create_task', 'args': args, 'id': 'call_1'}]),
+        ToolMessage(content="...", name='create_task', tool_call_id='call_1', status=status),
+        AIMessage(content="Erledigt"),
+    ]
+
+
+def test_successful_create_is_cached_as_arguments():
+    assert created_task_calls(_run('success')) == [{'task_title': "Essay schreiben", 'due_date': '2026-10-18'}]
+
+
+def test_failed_create_is_not_cached():
+    assert created_task_calls(_run('error')) is None
@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+import discord
+
+from discord_cleanup import DeletionScheduler, purge_channel
+from fakes import FakeDiscordClient, FakeUser
+
+
+def test_purge_keeps_messages_posted_after_startup():
+    async def scenario():
+        client = FakeDiscordClient(['hausaufgaben'])
+        channel = client.channel('hausaufgaben')
+        old = channel.receive(FakeUser('alice'), "alt")
+        await asyncio.sleep(0.01)
+        started_at = discord.utils.utcnow()
+        await asyncio.sleep(0.01)
+        new = channel.receive(FakeUser('bob'), "neu")
+        assert await purge_channel(channel, check=lambda message: True, before=started_at) == 1
+        assert old.id not in channel.messages
+        assert new.id in channel.messages
+
+    asyncio.run(scenario())
+
+
+def test_pending_deletions_survive_a_restart(tmp_path):
+    state_file = str(tmp_path / 'pending_deletions.json')
+
+    async def scenario():
+        client = FakeDiscordClient(['hausaufgaben'])
+        channel = client.channel('hausaufgaben')
+        message = channel.receive(FakeUser('alice'), "Mathe S. 4 bis morgen")
+
+        DeletionScheduler(client, state_file=state_file).schedule(message, delay=0.05)
+
+        # A new scheduler (after a restart) loads the pending deletion and carries it out
+        restarted = DeletionScheduler(client, state_file=state_file, batch_window=0)
+        restarted.start()
+        deadline = time.monotonic() + 2
+        while message.id in channel.messages and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        restarted._task.cancel()
+        assert message.id not in channel.messages
+        assert restarted.stats()['pending'] == 0
+
+    asyncio.run(scenario())
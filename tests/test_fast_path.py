@@ -0,0 +1,53 @@
+from datetime import date
+
+from fast_path import normalize_message, parse_homework
+
+TODAY = date(2026, 10, 17)
+
+
+def test_huge_day_count_is_not_a_due_date():
+    parsed = parse_homework("Mathe S. 3 in 99999999 Tagen", today=TODAY)
+    assert parsed.due_date is None
+    assert not parsed.confident
+
+
+def test_normalize_message_keeps_huge_day_count():
+    assert normalize_message("Essay in 99999999 Tagen schreiben", today=TODAY) == "essay in 99999999 tagen schreiben"
+
+
+def test_cancellations_go_to_the_agent():
+    for text in ("Mathe: keine Hausaufgaben bis morgen", "Mathe fällt morgen aus",
+                 "Mathe Test am 20.10. verschoben", "Maths homework cancelled"):
+        assert not parse_homework(text, today=TODAY).confident, text
+
+
+def test_subject_alone_is_not_a_title():
+    assert not parse_homework("Mathe bis morgen", today=TODAY).confident
+
+
+def test_date_cut_from_the_middle_leaves_single_spaces():
+    parsed = parse_homework("Mathe S. 42 bis morgen Nr. 3", today=TODAY)
+    assert parsed.confident
+    assert parsed.title == "Mathe S. 42 Nr. 3"
+    assert parsed.due_date == date(2026, 10, 18)
+
+
+def test_chatter_about_homework_goes_to_the_agent():
+    for text in ("Ich hab Mathe S. 42 bis morgen vergessen lol", "Hat jemand Mathe S. 42 bis morgen?",
+                 "Mathe S. 42 ist nicht bis morgen", "I forgot Maths page 42 by tomorrow"):
+        assert not parse_homework(text, today=TODAY).confident, text
+
+
+def test_recently_passed_date_is_left_to_the_agent():
+    parsed = parse_homework("Mathe am 12.10. S. 4", today=TODAY)
+    assert parsed.due_date is None
+    assert not parsed.confident
+
+
+def test_date_long_past_means_next_year():
+    parsed = parse_homework("Mathe S. 4 bis 10.01.", today=TODAY)
+    assert parsed.due_date == date(2027, 1, 10)
+
+
+def test_upcoming_date_without_year():
+    assert parse_homework("Mathe S. 4 bis 20.10.", today=TODAY).due_date == date(2026, 10, 20)
@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import httplib2
+import pytest
+
+from governor import CircuitBreaker, CircuitOpenError, DiscordGovernor, RequestGovernor
+
+
+def _responses(*statuses):
+    calls = []
+
+    def send():
+        calls.append(None)
+        status = statuses[min(len(calls), len(statuses)) - 1]
+        return httplib2.Response({'status': status}), b''
+
+    return send, calls
+
+
+def _governor(**kwargs):
+    return RequestGovernor(rate=1000, capacity=1000, base_delay=0, **kwargs)
+
+
+def test_idempotent_requests_are_retried_on_server_errors():
+    governor = _governor()
+    send, calls = _responses(503, 502, 200)
+
+    response, _ = governor.send(send)
+
+    assert response.status == 200
+    assert len(calls) == 3
+    assert governor.stats()['retries'] == 2
+
+
+def test_non_idempotent_requests_are_retried_only_when_rate_limited():
+    governor = _governor()
+    send, calls = _responses(503, 200)
+    response, _ = governor.send(send, idempotent=False)
+    assert response.status == 503
+    assert len(calls) == 1
+
+    send, calls = _responses(429, 200)
+    response, _ = governor.send(send, idempotent=False)
+    assert response.status == 200
+    assert len(calls) == 2
+
+
+def test_circuit_opens_after_repeated_failures_and_rejects_calls():
+    governor = _governor(max_retries=0, failure_threshold=2, reset_timeout=60)
+    send, calls = _responses(500)
+    governor.send(send)
+    governor.send(send)
+
+    with pytest.raises(CircuitOpenError):
+        governor.send(send)
+    assert len(calls) == 2
+    assert governor.stats()['circuit_open']
+    assert governor.stats()['rejected'] == 1
+
+
+def test_circuit_lets_a_trial_call_through_after_the_reset_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.is_open
+
+    assert breaker.allow()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.times_opened == 1
+
+
+def _http_error(status):
+    return discord.HTTPException(SimpleNamespace(status=status, reason='Fake'), 'error')
+
+
+def _failing(*statuses):
+    calls = []
+
+    async def func():
+        calls.append(None)
+        if len(calls) <= len(statuses):
+            raise _http_error(statuses[len(calls) - 1])
+        return 'ok'
+
+    return func, calls
+
+
+def test_discord_calls_are_retried_on_server_errors():
+    governor = DiscordGovernor(rate=1000, capacity=1000, base_delay=0)
+    func, calls = _failing(500, 503)
+
+    assert asyncio.run(governor.call(('edit', 1), func)) == 'ok'
+    assert len(calls) == 3
+
+
+def test_discord_sends_are_not_retried_on_server_errors():
+    governor = DiscordGovernor(rate=1000, capacity=1000, base_delay=0)
+    func, calls = _failing(500)
+    with pytest.raises(discord.HTTPException):
+        asyncio.run(governor.call(('send', 1), func, idempotent=False))
+    assert len(calls) == 1
+
+    func, calls = _failing(429)
+    assert asyncio.run(governor.call(('send', 1), func, idempotent=False)) == 'ok'
+    assert len(calls) == 2
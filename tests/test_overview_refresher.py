@@ -0,0 +1,53 @@
+import asyncio
+
+from fakes import FakeDiscordClient
+from governor import CircuitOpenError
+from overview_refresher import OverviewRegistry, PinnedOverviewPublisher
+
+
+def _registry(resolve_tasklist, render=None):
+    async def default_render(tasklist_id):
+        return "### Aufgabenübersicht\nleer"
+
+    client = FakeDiscordClient(['hausaufgaben'])
+    registry = OverviewRegistry(client, PinnedOverviewPublisher(), render or default_render, resolve_tasklist,
+                                min_interval=0.01, debounce=0.01)
+    registry.add('hausaufgaben', "Schule")
+    return registry, client
+
+
+def test_unavailable_google_is_retried_by_the_refresh_loop():
+    failing = [True]
+
+    async def resolve_tasklist(title):
+        if failing[0]:
+            raise CircuitOpenError("open")
+        return 'list1'
+
+    async def scenario():
+        registry, client = _registry(resolve_tasklist)
+        await registry.resolve()
+        assert registry.targets == {}
+        assert registry.next_resolve is not None
+
+        failing[0] = False
+        await registry.refresh_due()  # Waits for the retry deadline
+        await registry.refresh_due()
+        assert [target.tasklist_id for target in registry.targets.values()] == ['list1']
+        assert registry.next_resolve is None
+        assert any(message.pinned for message in client.channel('hausaufgaben').messages.values())
+
+    asyncio.run(scenario())
+
+
+def test_unknown_tasklist_is_skipped_without_retry():
+    async def resolve_tasklist(title):
+        raise ValueError(f"Tasklist '{title}' not found")
+
+    async def scenario():
+        registry, _ = _registry(resolve_tasklist)
+        await registry.resolve()
+        assert registry.targets == {}
+        assert registry.next_resolve is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+
+from overview_renderer import OVERVIEW_HEADER, PASSED_HEADER, PENDING_HEADER, OverviewRenderer
+from task_snapshot import TaskSnapshot
+
+NOW = datetime(2026, 10, 17, 12, tzinfo=timezone.utc)
+
+
+def _task(index, days, updated='2026-10-17T10:00:00.000Z'):
+    due = (NOW + timedelta(days=days)).strftime('%Y-%m-%dT00:00:00.000Z')
+    return {'id': f'task{index}', 'title': f"Aufgabe {index} Mathe S. {index}", 'due': due,
+            'status': 'needsAction', 'updated': updated}
+
+
+def _snapshot(tasks):
+    return TaskSnapshot('list1', tasks, now=NOW)
+
+
+def test_small_overview_fits_on_one_unnumbered_page():
+    pages = OverviewRenderer().render(_snapshot([_task(1, 3), _task(2, -3)]))
+
+    assert len(pages) == 1
+    assert pages[0].startswith(OVERVIEW_HEADER + "\n")
+    assert PENDING_HEADER in pages[0] and PASSED_HEADER in pages[0]
+
+
+def test_large_overview_is_split_into_numbered_pages_within_the_limit():
+    tasks = [_task(index, 1 + index % 20) for index in range(150)] + [_task(1000 + index, -5) for index in range(20)]
+    pages = OverviewRenderer(limit=2000).render(_snapshot(tasks))
+
+    assert len(pages) > 1
+    for number, page in enumerate(pages, 1):
+        assert len(page) <= 2000
+        assert page.startswith(f"{OVERVIEW_HEADER} ({number}/{len(pages)})\n")
+        # A page never ends in a heading without lines
+        assert page.splitlines()[-1] not in (PENDING_HEADER, PASSED_HEADER)
+    # A section continued on the next page repeats its heading
+    assert all(page.splitlines()[1] in (PENDING_HEADER, PASSED_HEADER) for page in pages)
+    rendered = '\n'.join(pages)
+    assert all(f"Aufgabe {index} Mathe" in rendered for index in range(150))
+
+
+def test_unchanged_tasks_reuse_their_rendered_lines():
+    renderer = OverviewRenderer()
+    tasks = [_task(index, 2) for index in range(10)]
+    renderer.render(_snapshot(tasks))
+
+    tasks[0] = _task(0, 2, updated='2026-10-17T11:00:00.000Z')
+    renderer.render(_snapshot(tasks))
+
+    assert renderer.stats()['lines_rendered'] == 11
+    assert renderer.stats()['lines_reused'] == 9
+    assert renderer.stats()['lines_cached'] == 10
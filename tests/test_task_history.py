@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from fakes import FakeTasksService
+from task_history import CompletedTaskIndex, TaskHistoryView, parse_history_command
+from task_store import TaskStore
+from task_sync import format_rfc3339
+
+
+def _completed(service, tasklist_id, title, days_ago):
+    completed = format_rfc3339(datetime.now(timezone.utc) - timedelta(days=days_ago))
+    return service._insert(tasklist_id, {'title': title, 'status': 'completed', 'completed': completed})
+
+
+def _index(tmp_path):
+    service = FakeTasksService()
+    tasklist_id = service.add_tasklist("Schule")
+    index = CompletedTaskIndex(TaskStore(str(tmp_path / 'tasks.sqlite')), history_days=90, window_days=30)
+    return service, tasklist_id, index
+
+
+def test_parse_history_command():
+    assert parse_history_command("/task-history") == (10, None)
+    assert parse_history_command("/task-history 5 mathe") == (5, "Mathe")
+    assert parse_history_command("/task-history 500") == (50, None)
+
+
+def test_first_refresh_walks_back_the_history_in_windows(tmp_path):
+    service, tasklist_id, index = _index(tmp_path)
+    for days_ago in (1, 40, 80, 200):
+        _completed(service, tasklist_id, f"Mathe vor {days_ago} Tagen", days_ago)
+    service.add_task(tasklist_id, "Mathe offen")
+
+    index.refresh(service, tasklist_id)
+
+    assert index.stats()['windows_fetched'] == 3
+    assert [task['title'] for task in index.query(tasklist_id)] == [
+        "Mathe vor 1 Tagen", "Mathe vor 40 Tagen", "Mathe vor 80 Tagen",
+    ]
+
+
+def test_later_refreshes_only_fetch_newly_completed_tasks(tmp_path):
+    service, tasklist_id, index = _index(tmp_path)
+    _completed(service, tasklist_id, "Deutsch Aufsatz", 10)
+    index.refresh(service, tasklist_id)
+    windows = index.stats()['windows_fetched']
+
+    _completed(service, tasklist_id, "Bio Referat", 0)
+    index.refresh(service, tasklist_id)
+
+    assert index.stats()['windows_fetched'] == windows + 1
+    assert [task['title'] for task in index.query(tasklist_id)] == ["Bio Referat", "Deutsch Aufsatz"]
+    assert [task['title'] for task in index.query(tasklist_id, subject="Bio")] == ["Bio Referat"]
+
+
+def test_history_view_pages_through_the_queried_tasks():
+    tasks = [{'title': f"Aufgabe {index}", 'completed': '2026-10-01T10:00:00.000Z'} for index in range(12)]
+
+    async def scenario():
+        view = TaskHistoryView(tasks, page_size=5)
+        assert view.page_count == 3
+        assert "Seite 1/3" in view.content() and "Aufgabe 4" in view.content()
+        assert view.previous_page.disabled and not view.next_page.disabled
+        view.page = 2
+        view._update_buttons()
+        assert "Aufgabe 11" in view.content() and "Aufgabe 4" not in view.content()
+        assert view.next_page.disabled
+
+    asyncio.run(scenario())
@@ -0,0 +1,85 @@
+import threading
+
+from fakes import FakeTasksService
+from task_store import TaskStore
+from task_sync import TaskSyncEngine, iter_tasks
+
+
+class ThreadRecordingService:
+    """Forwards to a fake service and records which threads used it."""
+
+    def __init__(self, service):
+        self.service = service
+        self.threads = set()
+
+    def tasks(self):
+        self.threads.add(threading.get_ident())
+        return self.service.tasks()
+
+
+def _titles(tasks):
+    return sorted(task['title'] for task in tasks)
+
+
+def test_prefetch_uses_the_workers_own_service():
+    fake = FakeTasksService(page_size=10)
+    tasklist_id = fake.add_tasklist("Schule")
+    fake.populate(tasklist_id, 35)
+    caller = ThreadRecordingService(fake)
+    worker = ThreadRecordingService(fake)
+
+    tasks = list(iter_tasks(caller, tasklist_id, prefetch_service=lambda: worker, page_size=10))
+
+    assert len(tasks) == 35
+    assert caller.threads == {threading.get_ident()}
+    assert worker.threads and threading.get_ident() not in worker.threads
+
+
+def test_abandoned_iteration_stops_fetching_pages():
+    fake = FakeTasksService(page_size=10)
+    tasklist_id = fake.add_tasklist("Schule")
+    fake.populate(tasklist_id, 100)
+
+    pages = iter_tasks(fake, tasklist_id, prefetch_service=lambda: fake, page_size=10)
+    next(pages)
+    pages.close()
+
+    assert fake.calls['tasks.list'] <= 2
+
+
+def test_delta_sync_merges_changes_into_the_local_copy(tmp_path):
+    fake = FakeTasksService()
+    tasklist_id = fake.add_tasklist("Schule")
+    kept = fake.add_task(tasklist_id, "Mathe S. 42")
+    done = fake.add_task(tasklist_id, "Deutsch Aufsatz")
+    removed = fake.add_task(tasklist_id, "Bio Referat")
+    store = TaskStore(str(tmp_path / 'tasks.sqlite'))
+    engine = TaskSyncEngine(store=store)
+    engine.sync(fake, tasklist_id)
+
+    fake.add_task(tasklist_id, "Englisch Vokabeln")
+    fake.tasks().patch(tasklist=tasklist_id, task=done['id'], body={'status': 'completed'}).execute()
+    fake.tasks().patch(tasklist=tasklist_id, task=removed['id'], body={'deleted': True}).execute()
+    tasks = engine.sync(fake, tasklist_id)
+
+    assert engine.stats()['full_syncs'] == 1
+    assert engine.stats()['delta_syncs'] == 1
+    assert _titles(tasks) == ["Deutsch Aufsatz", "Englisch Vokabeln", "Mathe S. 42"]
+    assert {task['id']: task['status'] for task in tasks}[done['id']] == 'completed'
+    assert kept['id'] in {task['id'] for task in tasks}
+    assert _titles(store.load_tasks(tasklist_id)) == _titles(tasks)
+
+
+def test_delta_with_an_unknown_parent_schedules_a_full_resync():
+    fake = FakeTasksService()
+    tasklist_id = fake.add_tasklist("Schule")
+    fake.add_task(tasklist_id, "Mathe S. 42")
+    engine = TaskSyncEngine()
+    engine.sync(fake, tasklist_id)
+
+    fake._insert(tasklist_id, {'title': "Teilaufgabe", 'parent': 'task-unknown'})
+    engine.sync(fake, tasklist_id)
+    engine.sync(fake, tasklist_id)
+
+    assert engine.stats()['delta_syncs'] == 1
+    assert engine.stats()['full_syncs'] == 2
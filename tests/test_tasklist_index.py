@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from fakes import FakeTasksService
+from task_store import TaskStore
+from tasklist_index import TasklistIndex
+
+
+def _service():
+    service = FakeTasksService()
+    school_id = service.add_tasklist("Schule")
+    return service, school_id
+
+
+def test_lookups_are_served_from_the_index_until_the_ttl_expires():
+    service, school_id = _service()
+    index = TasklistIndex(ttl=0.05)
+
+    assert index.get_id(service, "Schule") == school_id
+    assert index.get_id(service, "schule") == school_id
+    assert service.calls['tasklists.list'] == 1
+
+    time.sleep(0.06)
+    assert index.get_id(service, "Schule") == school_id
+    assert service.calls['tasklists.list'] == 2
+    assert index.stats() == {'tasklists': 1, 'hits': 1, 'misses': 2, 'reloads': 2}
+
+
+def test_a_miss_reloads_once_to_find_new_tasklists():
+    service, _ = _service()
+    index = TasklistIndex()
+    index.get_id(service, "Schule")
+
+    private_id = service.add_tasklist("My Tasks")
+    assert index.get_id(service, "My Tasks") == private_id
+
+    with pytest.raises(ValueError):
+        index.get_id(service, "Unbekannt")
+    assert index.stats()['reloads'] == 3
+
+
+def test_the_index_starts_from_the_stored_tasklists(tmp_path):
+    service, school_id = _service()
+    store = TaskStore(str(tmp_path / 'tasks.sqlite'))
+    TasklistIndex(store=store).get_id(service, "Schule")
+
+    index = TasklistIndex(store=store)
+    assert index.get_id(service, "Schule") == school_id
+    assert service.calls['tasklists.list'] == 1
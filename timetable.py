@@ -0,0 +1,94 @@
+import json
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from fast_path import SUBJECTS
+
+WEEK_SECONDS = 7 * 24 * 3600
+
+# Course level markers in WebUntis student group names (e.g. "LK-Elt", "M-LK1")
+COURSE_LEVELS = {'lk', 'gk'}
+
+
+# Subject name of a lesson from its student group, e.g. "powi1_Q34-WP_Bick" -> "PoWi"
+def subject_from_group(group):
+    for part in group.split('_', 1)[0].split('-'):
+        key = re.sub(r'\d+$', '', part).lower()
+        if key and key not in COURSE_LEVELS and key in SUBJECTS:
+            return SUBJECTS[key]
+    return None
+
+
+class Timetable:
+    """Lesson start times per subject, loaded lazily from the WebUntis export.
+
+    The JSON file is parsed on first use (and again when it changes on disk)
+    into one sorted array of epoch seconds per subject, so "next lesson of X
+    after T" is a binary search. Past the end of the export the last week
+    of lessons is assumed to repeat weekly.
+    """
+
+    def __init__(self, path='timetable_data_by_day.json', timezone='Europe/Berlin'):
+        self.path = path
+        self.tz = ZoneInfo(timezone)
+        self._lock = threading.Lock()
+        self._starts = None
+        self._mtime = None
+
+    def _load(self):
+        mtime = os.path.getmtime(self.path)
+        if self._starts is not None and mtime == self._mtime:
+            return self._starts
+        with open(self.path, encoding='utf-8') as timetable_file:
+            days = json.load(timetable_file)
+        starts = {}
+        for day, lessons in days.items():
+            for lesson in lessons:
+                details = lesson['details']
+                start = datetime.fromisoformat(f"{day}T{lesson['time']}").replace(tzinfo=self.tz)
+                keys = {str(subject_id) for subject_id in details.get('subject_id', [])}
+                subject = subject_from_group(details.get('sg') or '')
+                if subject:
+                    keys.add(subject.casefold())
+                for key in keys:
+                    starts.setdefault(key, set()).add(int(start.timestamp()))
+        self._starts = {key: array('q', sorted(values)) for key, values in starts.items()}
+        self._mtime = mtime
+        print(f"Indexed timetable with {len(self._starts)} subjects")
+        return self._starts
+
+    # Subject names (and WebUntis subject IDs) that have lessons
+    def subjects(self):
+        with self._lock:
+            return sorted(self._load())
+
+    # Start of the next lesson of `subject` after `after` (default: now), or None
+    def next_lesson(self, subject, after=None):
+        after = after or datetime.now(self.tz)
+        if after.tzinfo is None:
+            after = after.replace(tzinfo=self.tz)
+        key = SUBJECTS.get(subject.lower(), subject).casefold()
+        with self._lock:
+            starts = self._load().get(key)
+        if not starts:
+            return None
+        timestamp = after.timestamp()
+        index = bisect_right(starts, timestamp)
+        if index < len(starts):
+            return datetime.fromtimestamp(starts[index], self.tz)
+
+        # Project the last week of the export forward in whole weeks
+        last_week = starts[bisect_right(starts, starts[-1] - WEEK_SECONDS):]
+        candidates = []
+        for start in last_week:
+            local = datetime.fromtimestamp(start, self.tz)
+            candidate = local + timedelta(weeks=int((timestamp - start) // WEEK_SECONDS))
+            while candidate.timestamp() <= timestamp:
+                candidate += timedelta(weeks=1)
+            candidates.append(candidate)
+        return min(candidates)